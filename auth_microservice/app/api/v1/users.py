@@ -1,14 +1,21 @@
+import base64
+import json
 import uuid
 from app.api.deps import get_session
+from app.core.config import settings
 from app.core.security import auth_validator
-from app.kafka_config.kafka_producer import kafka_producer
+from app.kafka_config.outbox_relay import outbox_relay
+from app.models.outbox import OutboxEvent
 from app.models.users import User as UserModel
 from app.schemas.users import User as UserSchema
 from app.schemas.users import UserCreate as UserCreateSchema
-from fastapi import APIRouter, Depends, HTTPException
+from app.schemas.users import UserBatchRequest, UserBatchResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import List
+from sqlalchemy import any_, literal, select, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY
+from typing import List, Literal, Optional
 from sqlalchemy import exc
 
 router = APIRouter(prefix="/users", tags=["Users"])
@@ -16,13 +23,82 @@ router = APIRouter(prefix="/users", tags=["Users"])
 
 @router.get("/", response_model=List[UserSchema],
             dependencies=[Depends(auth_validator.extract_token_data)])
-async def get_all_users(session: AsyncSession = Depends(get_session)
-                        ) -> List[UserSchema]:
+async def get_all_users(
+        response: Response,
+        cursor: Optional[str] = None,
+        order_by: Literal["id", "username"] = "id",
+        limit: int = Query(settings.USERS_PAGE_SIZE, ge=1, le=settings.USERS_MAX_PAGE_SIZE),
+        session: AsyncSession = Depends(get_session),
+) -> List[UserSchema]:
+    """
+    Retrieve a page of users
+
+    The cursor of the next page is returned in the X-Next-Cursor header
+    and is absent on the last page.
+    """
+    columns = (UserModel.id, UserModel.username, UserModel.email, UserModel.is_active)
+    keys = (UserModel.id,) if order_by == "id" else (UserModel.username, UserModel.id)
+    query = select(*columns).order_by(*keys).limit(limit)
+    if cursor is not None:
+        values = _decode_cursor(cursor, len(keys))
+        query = query.where(
+            tuple_(*keys) > tuple_(*(literal(v, key.type) for key, v in zip(keys, values)))
+        )
+    rows = (await session.execute(query)).all()
+    if len(rows) == limit:
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = _encode_cursor(
+            [str(last.id)] if order_by == "id" else [last.username, str(last.id)]
+        )
+    return [UserSchema.from_orm(row) for row in rows]
+
+
+def _encode_cursor(values: List[Optional[str]]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str, size: int) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    try:
+        # The user ID is always the last sort key
+        values[-1] = uuid.UUID(values[-1])
+    except (ValueError, TypeError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+@router.post("/batch", response_model=UserBatchResponse,
+             dependencies=[Depends(auth_validator.extract_token_data)])
+async def get_users_by_ids(batch: UserBatchRequest,
+                           session: AsyncSession = Depends(get_session)
+                           ) -> UserBatchResponse:
     """
-    Retrieve all users
+    Get users by a list of IDs in one query
+
+    Users are returned in the order of the requested IDs, with null in
+    place of every ID that does not exist; those IDs are also listed in
+    `missing`.
     """
-    users = await session.execute(select(UserModel))
-    return users.scalars().all()
+    if len(batch.ids) > settings.USERS_BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.USERS_BATCH_MAX_IDS} IDs can be requested at once",
+        )
+    ids = list(dict.fromkeys(batch.ids))
+    query = select(
+        UserModel.id, UserModel.username, UserModel.email, UserModel.is_active
+    ).where(UserModel.id == any_(literal(ids, ARRAY(UserModel.id.type))))
+    rows = (await session.execute(query)).all()
+    found = {row.id: UserSchema.from_orm(row) for row in rows}
+    return UserBatchResponse(
+        users=[found.get(user_id) for user_id in batch.ids],
+        missing=[user_id for user_id in ids if user_id not in found],
+    )
 
 
 @router.get("/{user_id}", response_model=UserSchema,
@@ -54,10 +130,16 @@ async def create_user(
     )
     try:
         session.add(user)
+        await session.flush()
+        user_schema = UserSchema.from_orm(user)
+        session.add(OutboxEvent(
+            topic='user_events',
+            key=str(user.id),
+            payload={"type": "user_created", "user": jsonable_encoder(user_schema)},
+        ))
         await session.commit()
-        kafka_data = {"type": "user_created", "user": user.dict()}
-        await kafka_producer.send('user_events', kafka_data)
     except exc.IntegrityError:
         raise HTTPException(status_code=400,
                             detail="User with this username already exists")
-    return UserSchema.from_orm(user)
+    outbox_relay.notify()
+    return user_schema
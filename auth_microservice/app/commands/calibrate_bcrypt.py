@@ -0,0 +1,57 @@
+"""Recommend a bcrypt cost for this machine
+
+Times password verification at increasing bcrypt rounds and recommends the
+highest cost whose median verification stays within the target latency.
+Set the result as BCRYPT_ROUNDS; existing hashes are upgraded on login.
+
+Usage:
+    python -m app.commands.calibrate_bcrypt [--target-ms 250] [--samples 5]
+
+"""
+import argparse
+import os
+import statistics
+import time
+
+from passlib.hash import bcrypt
+
+MIN_ROUNDS = 4
+MAX_ROUNDS = 31
+
+
+def measure(rounds: int, samples: int) -> float:
+    """
+    Median time in seconds to verify a password hashed with `rounds`.
+    """
+    hashed = bcrypt.using(rounds=rounds).hash("calibration-password")
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        bcrypt.verify("calibration-password", hashed)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def calibrate(target_ms: float, samples: int) -> int:
+    recommended = MIN_ROUNDS
+    for rounds in range(MIN_ROUNDS, MAX_ROUNDS + 1):
+        elapsed_ms = measure(rounds, samples) * 1000
+        print(f"rounds={rounds:<3} verify={elapsed_ms:9.1f}ms")
+        if elapsed_ms > target_ms:
+            break
+        recommended = rounds
+    return recommended
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--target-ms",
+        type=float,
+        default=float(os.getenv("PASSWORD_VERIFY_TARGET_MS", 250)),
+    )
+    parser.add_argument("--samples", type=int, default=5)
+    args = parser.parse_args()
+
+    rounds = calibrate(args.target_ms, args.samples)
+    print(f"Recommended BCRYPT_ROUNDS={rounds} for a {args.target_ms:.0f}ms target")
@@ -16,7 +16,24 @@ class Settings(BaseSettings):
     FIRST_USER_PASSWORD: SecretStr
     SECRET_KEY: SecretStr
     ACCESS_TOKEN_EXPIRE_MINUTES: int
+    TOKEN_CACHE_SIZE: int = 10000
     ALGORITHM: str
+    # bcrypt cost; stored hashes with a different cost are rehashed on login.
+    # Use app.commands.calibrate_bcrypt to pick a value for the hardware.
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_VERIFY_TARGET_MS: int = 250
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE_LIMIT: int = 64
+    USERS_PAGE_SIZE: int = 50
+    USERS_MAX_PAGE_SIZE: int = 500
+    USERS_BATCH_MAX_IDS: int = 500
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_POLL_INTERVAL_MS: int = 500
+    # Upper bound of the retry delay while Kafka is unavailable
+    OUTBOX_RETRY_BACKOFF_MAX_MS: int = 30000
+    # Sent events are kept this long, then deleted
+    OUTBOX_RETENTION_HOURS: int = 24
+    OUTBOX_CLEANUP_INTERVAL_S: int = 300
     GET_TOKEN_DATA_403: str = 'Could not validate credentials'
     GET_CURRENT_USER_404: str = 'User not found'
     OAUTH2_NOT_AUTHENTICATED: str = 'Not authenticated'
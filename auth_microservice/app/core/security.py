@@ -1,5 +1,11 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Callable, Optional
 
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
@@ -14,15 +20,205 @@ from app.core.config import settings
 from app.models.users import User
 from app.schemas.token import TokenPayload
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
 
 MESSAGE_GET_TOKEN_DATA_403 = 'Could not validate credentials'
+MESSAGE_PASSWORD_HASHER_BUSY_503 = 'Too many concurrent logins, try again later'
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing and verification on a bounded thread pool so that
+    it never blocks the event loop.
+
+    At most `workers` hashes run at once and up to `queue_limit` more may
+    wait; anything beyond that is rejected immediately with a 503.
+
+    Verification times are sampled, and a warning is logged when their p99
+    exceeds `verify_target_ms`, i.e. when BCRYPT_ROUNDS is too high for
+    this machine.
+    """
+
+    VERIFY_SAMPLES = 200
+
+    def __init__(
+            self,
+            context: CryptContext,
+            workers: int,
+            queue_limit: int,
+            verify_target_ms: Optional[float] = None,
+    ) -> None:
+        self._context = context
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._capacity = workers + queue_limit
+        self.verify_target_ms = verify_target_ms
+        self._verify_ms: deque = deque(maxlen=self.VERIFY_SAMPLES)
+        self._verifies = 0
+        self.in_flight = 0
+        self.rejected = 0
+
+    async def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        if self.in_flight >= self._capacity:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail=MESSAGE_PASSWORD_HASHER_BUSY_503,
+                headers={"Retry-After": "1"},
+            )
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, func, *args
+            )
+        finally:
+            self.in_flight -= 1
+
+    def _timed(self, func: Callable[..., Any], *args: Any) -> Any:
+        # Runs on the pool, so queueing time is not counted
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self._verify_ms.append((time.perf_counter() - started) * 1000)
+
+    def _check_verify_latency(self):
+        self._verifies += 1
+        if self.verify_target_ms is None or self._verifies % self.VERIFY_SAMPLES:
+            return
+        p99 = self.verify_p99_ms()
+        if p99 > self.verify_target_ms:
+            logger.warning(
+                f"Password verification p99 is {p99:.0f}ms, above the "
+                f"{self.verify_target_ms:.0f}ms target; consider lowering "
+                f"BCRYPT_ROUNDS (see app.commands.calibrate_bcrypt)"
+            )
+
+    def verify_p99_ms(self) -> float:
+        """
+        p99 of the recent verification times, 0 without samples.
+        """
+        if not self._verify_ms:
+            return 0.0
+        samples = sorted(self._verify_ms)
+        return samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+    async def hash(self, plain_password: str) -> str:
+        return await self._run(self._context.hash, plain_password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        try:
+            return await self._run(
+                self._timed, self._context.verify, plain_password, hashed_password
+            )
+        finally:
+            self._check_verify_latency()
+
+    async def verify_and_update(
+            self, plain_password: str, hashed_password: str
+    ) -> tuple[bool, Optional[str]]:
+        """
+        Verify a password and rehash it if the stored hash uses an outdated cost.
+
+        Returns:
+            tuple[bool, Optional[str]]: Whether the password matches, and the
+                replacement hash if one is needed.
+        """
+        try:
+            return await self._run(
+                self._timed, self._context.verify_and_update, plain_password, hashed_password
+            )
+        finally:
+            self._check_verify_latency()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher(
+    pwd_context,
+    settings.PASSWORD_HASH_WORKERS,
+    settings.PASSWORD_HASH_QUEUE_LIMIT,
+    verify_target_ms=settings.PASSWORD_VERIFY_TARGET_MS,
+)
+
+
+class TokenCache:
+    """
+    Bounded LRU cache of decoded JWT claims, keyed by token digest.
+
+    Entries are dropped once their `exp` has passed, so an expired token is
+    never served from the cache. Tokens without `exp` are not cached.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        claims = self._entries.get(key)
+        if claims is None or claims["exp"] <= time.time():
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return claims
+
+    def set(self, token: str, claims: dict):
+        if not isinstance(claims.get("exp"), (int, float)):
+            return
+        key = self._key(token)
+        self._entries[key] = claims
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, token: Optional[str] = None):
+        """
+        Drop one token from the cache, or every token if none is given.
+        """
+        if token is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(self._key(token), None)
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
 
 
 class AuthValidator:
-    def __init__(self, secret_key: str, algorithms: list[str]) -> None:
+    def __init__(self, secret_key: str, algorithms: list[str], cache_size: int = 10000) -> None:
         self._secret_key = secret_key
         self._algorithms = algorithms
+        self.token_cache = TokenCache(cache_size)
+
+    def decode(self, encoded_token: str) -> dict:
+        """
+        Decode and verify a JWT token, reusing cached claims for repeat callers.
+
+        Raises:
+            jwt.JWTError: If the token is invalid or expired.
+        """
+        claims = self.token_cache.get(encoded_token)
+        if claims is None:
+            claims = jwt.decode(encoded_token, self._secret_key, algorithms=self._algorithms)
+            self.token_cache.set(encoded_token, claims)
+        return claims
 
     async def validate_token(self, encoded_token: str) -> TokenPayload:
         """
@@ -38,9 +234,7 @@ class AuthValidator:
             TokenPayload: The decoded payload of the token.
         """
         try:
-            decoded_token = jwt.decode(
-                encoded_token, self._secret_key, algorithms=self._algorithms
-            )
+            decoded_token = self.decode(encoded_token)
             return TokenPayload(user_id=decoded_token["user_id"])
         except jwt.JWTError:
             raise HTTPException(status_code=403, detail="Invalid token")
@@ -77,8 +271,11 @@ class AuthValidator:
 
         Returns:
             bool: True if the plain password matches the hashed password, False otherwise.
+
+        Raises:
+            HTTPException: If the password hashing pool is saturated.
         """
-        return pwd_context.verify(plain_password, hashed_password)
+        return await password_hasher.verify(plain_password, hashed_password)
 
     @staticmethod
     async def hash_password(plain_password: str) -> str:
@@ -90,8 +287,11 @@ class AuthValidator:
 
         Returns:
             str: The hashed password.
+
+        Raises:
+            HTTPException: If the password hashing pool is saturated.
         """
-        return pwd_context.hash(plain_password)
+        return await password_hasher.hash(plain_password)
     
     async def extract_token_data(
             self,
@@ -100,7 +300,7 @@ class AuthValidator:
             )
     ) -> TokenPayload:
         try:
-            decoded_token = jwt.decode(token, self._secret_key, algorithms=self._algorithms)
+            decoded_token = self.decode(token)
             token_data = TokenPayload(**decoded_token)
         except (jwt.JWTError, ValidationError) as error:
             raise HTTPException(status_code=403, detail=str(error))
@@ -111,9 +311,19 @@ class AuthValidator:
     ) -> Optional[User]:
         result = await session.execute(select(User).filter_by(username=username))
         user = result.scalars().first()
-        if user and await self.check_password(password, user.hashed_password):
-            return user
-        return None
+        if user is None:
+            return None
+        verified, new_hash = await password_hasher.verify_and_update(
+            password, user.hashed_password
+        )
+        if not verified:
+            return None
+        if new_hash is not None:
+            user.hashed_password = new_hash
+            await session.commit()
+        return user
 
 
-auth_validator = AuthValidator(settings.SECRET_KEY.get_secret_value(), [settings.ALGORITHM])
+auth_validator = AuthValidator(
+    settings.SECRET_KEY.get_secret_value(), [settings.ALGORITHM], settings.TOKEN_CACHE_SIZE
+)
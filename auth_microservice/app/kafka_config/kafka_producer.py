@@ -2,32 +2,79 @@ import json
 import os
 import asyncio
 import logging
-from typing import Optional
+from typing import Callable, List, Optional, Tuple, Union
 from aiokafka import AIOKafkaProducer
 
+from app.kafka_config.events import CODEC_NAMES, EventEnvelope, Headers
+
 logger = logging.getLogger(__name__)
 
 KAFKA_BOOTSTRAP_SERVERS = os.getenv('KAFKA_BOOTSTRAP_SERVERS', 'kafka:9092')
+KAFKA_LINGER_MS = int(os.getenv('KAFKA_LINGER_MS', '5'))
+KAFKA_MAX_BATCH_SIZE = int(os.getenv('KAFKA_MAX_BATCH_SIZE', '65536'))
+KAFKA_COMPRESSION_TYPE = os.getenv('KAFKA_COMPRESSION_TYPE', 'none')
+KAFKA_ACKS = os.getenv('KAFKA_ACKS', 'all')
+# Switch to 'msgpack' once every consumer decodes it
+KAFKA_EVENT_CODEC = os.getenv('KAFKA_EVENT_CODEC', 'json')
+
+ErrorCallback = Callable[[BaseException], None]
+
+
+def parse_acks(acks: str) -> Union[int, str]:
+    return acks if acks == 'all' else int(acks)
 
 
 class KafkaProducer:
     """
     Asynchronous Kafka producer.
 
-    Initializes a Kafka producer with the specified bootstrap servers.
+    Initializes a Kafka producer with the specified bootstrap servers and
+    batching settings. Messages are keyed so that all events of a user land
+    on the same partition.
     """
 
-    def __init__(self) -> None:
+    def __init__(
+            self,
+            bootstrap_servers: str = KAFKA_BOOTSTRAP_SERVERS,
+            linger_ms: int = KAFKA_LINGER_MS,
+            max_batch_size: int = KAFKA_MAX_BATCH_SIZE,
+            compression_type: str = KAFKA_COMPRESSION_TYPE,
+            acks: Union[int, str] = parse_acks(KAFKA_ACKS),
+            event_codec: str = KAFKA_EVENT_CODEC,
+            producer_factory: Callable[..., AIOKafkaProducer] = AIOKafkaProducer,
+    ) -> None:
         """
         Initialize Kafka producer.
 
         Args:
-            bootstrap_servers (Optional[str]): Kafka bootstrap servers.
+            bootstrap_servers (str): Kafka bootstrap servers.
                 Defaults to environment variable KAFKA_BOOTSTRAP_SERVERS or
                 'kafka:9092'.
+            linger_ms (int): How long to wait for more messages before
+                sending a batch. Defaults to KAFKA_LINGER_MS.
+            max_batch_size (int): Maximum size in bytes of a partition
+                batch. Defaults to KAFKA_MAX_BATCH_SIZE.
+            compression_type (str): 'none', 'gzip', 'snappy', 'lz4' or
+                'zstd'. Defaults to KAFKA_COMPRESSION_TYPE.
+            acks (Union[int, str]): 0, 1 or 'all'. Defaults to KAFKA_ACKS.
+            event_codec (str): Codec of event envelopes, 'json' or
+                'msgpack'. Defaults to KAFKA_EVENT_CODEC.
+            producer_factory (Callable[..., AIOKafkaProducer]): Builds the
+                underlying client, e.g. a stand-in for benchmarks.
         """
-        self.bootstrap_servers = KAFKA_BOOTSTRAP_SERVERS
+        self.bootstrap_servers = bootstrap_servers
+        self.linger_ms = linger_ms
+        self.max_batch_size = max_batch_size
+        self.compression_type = None if compression_type == 'none' else compression_type
+        self.acks = acks
+        self.event_codec = CODEC_NAMES[event_codec]
+        self.producer_factory = producer_factory
         self.producer: Optional[AIOKafkaProducer] = None
+        # Serializes start() and stop(); the client is only published once
+        # it has started, so concurrent callers never send on it too early
+        self._lifecycle_lock = asyncio.Lock()
+        self.delivered = 0
+        self.failed = 0
 
     async def __aenter__(self):
         """
@@ -53,44 +100,147 @@ class KafkaProducer:
         """
         Start the Kafka producer.
         """
-        if self.producer is None:
-            loop = asyncio.get_running_loop()
-            self.producer = AIOKafkaProducer(
+        async with self._lifecycle_lock:
+            if self.producer is not None:
+                return
+            producer = self.producer_factory(
                 bootstrap_servers=self.bootstrap_servers,
-                loop=loop
+                linger_ms=self.linger_ms,
+                max_batch_size=self.max_batch_size,
+                compression_type=self.compression_type,
+                acks=self.acks,
             )
-            await self.producer.start()
+            try:
+                await producer.start()
+            except Exception:
+                # Let the next start() try again with a fresh client
+                try:
+                    await producer.stop()
+                except Exception:
+                    pass
+                raise
+            self.producer = producer
             logger.info("Kafka producer started.")
 
     async def stop(self):
         """
-        Stop the Kafka producer.
+        Stop the Kafka producer, flushing pending batches.
+        """
+        async with self._lifecycle_lock:
+            if self.producer:
+                await self.producer.stop()
+                self.producer = None
+                logger.info("Kafka producer stopped.")
+
+    @staticmethod
+    def encode_message(message: dict) -> bytes:
+        return json.dumps(message, separators=(',', ':')).encode('utf-8')
+
+    async def send(
+            self,
+            topic: str,
+            message: dict,
+            key: Optional[str] = None,
+            on_error: Optional[ErrorCallback] = None,
+    ) -> asyncio.Future:
         """
-        if self.producer:
-            await self.producer.stop()
-            self.producer = None
-            logger.info("Kafka producer stopped.")
+        Queue a message for a Kafka topic without waiting for delivery.
 
-    async def encode_message(self, message: dict):
-        return json.dumps(message).encode('utf-8')
+        Args:
+            topic (str): Kafka topic.
+            message (dict): Message to be sent.
+            key (Optional[str]): Partition key, e.g. the user ID.
+            on_error (Optional[ErrorCallback]): Called with the exception
+                if delivery fails.
+
+        Returns:
+            asyncio.Future: Resolves to the record metadata once the broker
+                acknowledges the message; await it to wait for delivery.
 
-    async def send(self, topic: str, message: dict):
+        Raises:
+            Exception: If the producer is not initialized.
         """
-        Send a message to a Kafka topic.
+        return await self._send(topic, self.encode_message(message), key, None, on_error)
+
+    async def send_event(
+            self,
+            topic: str,
+            event: EventEnvelope,
+            key: Optional[str] = None,
+            on_error: Optional[ErrorCallback] = None,
+    ) -> asyncio.Future:
+        """
+        Queue an event envelope for a Kafka topic without waiting for delivery.
+
+        The payload is encoded with the configured codec and the envelope
+        metadata is sent as message headers.
 
         Args:
             topic (str): Kafka topic.
-            message (dict): Message to be sent.
+            event (EventEnvelope): Event to be sent.
+            key (Optional[str]): Partition key, e.g. the user ID.
+            on_error (Optional[ErrorCallback]): Called with the exception
+                if delivery fails.
+
+        Returns:
+            asyncio.Future: Resolves once the broker acknowledges the event.
 
         Raises:
             Exception: If the producer is not initialized.
         """
+        value, headers = event.encode(self.event_codec)
+        return await self._send(topic, value, key, headers, on_error)
+
+    async def send_batch(self, topic: str, events: List[Tuple[Optional[str], EventEnvelope]]):
+        """
+        Send several events to a Kafka topic and wait until all of them
+        are acknowledged by the broker.
+
+        Args:
+            topic (str): Kafka topic.
+            events (List[Tuple[Optional[str], EventEnvelope]]): Pairs of
+                partition key and event.
+
+        Raises:
+            Exception: If the producer is not initialized or an event
+                could not be delivered.
+        """
+        deliveries = [await self.send_event(topic, event, key) for key, event in events]
+        await asyncio.gather(*deliveries)
+
+    async def _send(
+            self,
+            topic: str,
+            value: bytes,
+            key: Optional[str],
+            headers: Optional[Headers],
+            on_error: Optional[ErrorCallback],
+    ) -> asyncio.Future:
         if self.producer is None:
             raise Exception("Producer is not initialized")
-        logger.info(f"Sending message to Kafka topic '{topic}': {message}")
-        encoded_message = await self.encode_message(message)
-        await self.producer.send(topic, encoded_message)
-        logger.info("Message sent successfully.")
+        encoded_key = key.encode('utf-8') if key is not None else None
+        delivery = await self.producer.send(
+            topic, value, key=encoded_key, headers=headers
+        )
+        delivery.add_done_callback(
+            lambda future: self._on_delivery(topic, future, on_error)
+        )
+        logger.debug(f"Queued message for Kafka topic '{topic}' with key {key}")
+        return delivery
+
+    def _on_delivery(
+            self, topic: str, future: asyncio.Future, on_error: Optional[ErrorCallback]
+    ):
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is None:
+            self.delivered += 1
+            return
+        self.failed += 1
+        logger.error(f"Failed to deliver message to Kafka topic '{topic}': {error}")
+        if on_error is not None:
+            on_error(error)
 
 
 kafka_producer = KafkaProducer()
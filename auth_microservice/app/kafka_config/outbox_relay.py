@@ -0,0 +1,172 @@
+import asyncio
+import datetime
+import logging
+import time
+from collections import defaultdict
+from typing import Optional
+
+from sqlalchemy import delete, select, update
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.kafka_config.events import EventEnvelope
+from app.kafka_config.kafka_producer import KafkaProducer, kafka_producer
+from app.models.outbox import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxRelay:
+    """
+    Publishes pending outbox events to Kafka in batches.
+
+    Events are locked with SKIP LOCKED, published, and marked as sent in
+    the same transaction, so several replicas can relay concurrently and a
+    crash before the commit only leads to the batch being sent again.
+
+    The relay runs even while Kafka is unavailable: it (re)starts the
+    producer before every batch and backs off exponentially on failures.
+    Sent events are deleted after OUTBOX_RETENTION_HOURS.
+    """
+
+    def __init__(
+            self,
+            producer: KafkaProducer,
+            batch_size: int = settings.OUTBOX_BATCH_SIZE,
+            poll_interval_ms: int = settings.OUTBOX_POLL_INTERVAL_MS,
+            retry_backoff_max_ms: int = settings.OUTBOX_RETRY_BACKOFF_MAX_MS,
+            retention_hours: int = settings.OUTBOX_RETENTION_HOURS,
+            cleanup_interval_s: int = settings.OUTBOX_CLEANUP_INTERVAL_S,
+    ) -> None:
+        self.producer = producer
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval_ms / 1000
+        self.retry_backoff_max = retry_backoff_max_ms / 1000
+        self.retention = datetime.timedelta(hours=retention_hours)
+        self.cleanup_interval = cleanup_interval_s
+        self._last_cleanup = 0.0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info("Outbox relay started.")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Outbox relay stopped.")
+
+    def notify(self):
+        """
+        Wake the relay up to publish new events without waiting for the
+        next poll.
+        """
+        self._wakeup.set()
+
+    async def _run(self):
+        delay = self.poll_interval
+        while True:
+            try:
+                sent = await self.relay_batch()
+            except Exception as e:
+                logger.error(f"Error relaying outbox events, retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.retry_backoff_max)
+                continue
+            delay = self.poll_interval
+            await self._maybe_cleanup()
+            if sent == self.batch_size:
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def relay_batch(self) -> int:
+        """
+        Publish one batch of pending events and mark them as sent.
+
+        Returns:
+            int: The number of events published.
+        """
+        await self.producer.start()
+        async with SessionLocal() as session:
+            async with session.begin():
+                result = await session.execute(
+                    select(OutboxEvent.id, OutboxEvent.topic, OutboxEvent.key, OutboxEvent.payload)
+                    .where(OutboxEvent.sent_at.is_(None))
+                    .order_by(OutboxEvent.id)
+                    .limit(self.batch_size)
+                    .with_for_update(skip_locked=True)
+                )
+                events = result.all()
+                if not events:
+                    return 0
+
+                by_topic = defaultdict(list)
+                for event in events:
+                    payload = dict(event.payload)
+                    envelope = EventEnvelope(
+                        event_type=payload.pop("type"),
+                        payload=payload,
+                        event_id=str(event.id),
+                    )
+                    by_topic[event.topic].append((event.key, envelope))
+                for topic, messages in by_topic.items():
+                    await self.producer.send_batch(topic, messages)
+
+                await session.execute(
+                    update(OutboxEvent)
+                    .where(OutboxEvent.id.in_([event.id for event in events]))
+                    .values(sent_at=datetime.datetime.utcnow())
+                )
+        return len(events)
+
+    async def _maybe_cleanup(self):
+        if time.monotonic() - self._last_cleanup < self.cleanup_interval:
+            return
+        self._last_cleanup = time.monotonic()
+        try:
+            deleted = await self.delete_sent()
+        except Exception as e:
+            logger.error(f"Error deleting sent outbox events: {e}")
+            return
+        if deleted:
+            logger.info(f"Deleted {deleted} sent outbox events.")
+
+    async def delete_sent(self, chunk_size: int = 1000) -> int:
+        """
+        Delete events sent longer than the retention period ago, in
+        chunks so that no transaction holds many row locks.
+
+        Returns:
+            int: The number of deleted events.
+        """
+        cutoff = datetime.datetime.utcnow() - self.retention
+        deleted = 0
+        while True:
+            async with SessionLocal() as session:
+                async with session.begin():
+                    expired = (
+                        select(OutboxEvent.id)
+                        .where(OutboxEvent.sent_at < cutoff)
+                        .limit(chunk_size)
+                        .scalar_subquery()
+                    )
+                    result = await session.execute(
+                        delete(OutboxEvent).where(OutboxEvent.id.in_(expired))
+                    )
+            deleted += result.rowcount
+            if result.rowcount < chunk_size:
+                return deleted
+
+
+outbox_relay = OutboxRelay(kafka_producer)
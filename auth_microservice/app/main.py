@@ -5,7 +5,9 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.api import router
 from app.core.config import settings
+from app.core.security import password_hasher
 from app.kafka_config.kafka_producer import kafka_producer
+from app.kafka_config.outbox_relay import outbox_relay
 logger = logging.getLogger(__name__)
 
 
@@ -18,6 +20,7 @@ def create_application() -> FastAPI:
         allow_credentials=True,
         allow_methods=["GET", "POST", "PUT", "DELETE"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor"],
     )
     application.include_router(router)
     return application
@@ -29,6 +32,8 @@ app = create_application()
 @app.on_event("startup")
 async def startup():
     logger.info("Starting Kafka producer and consumer...")
+    # The relay retries starting the producer if Kafka is not reachable yet
+    outbox_relay.start()
     try:
         await kafka_producer.start()
         logger.info("Kafka producer and consumer started.")
@@ -40,7 +45,9 @@ async def startup():
 async def shutdown():
     logger.info("Stopping Kafka producer and consumer...")
     try:
+        await outbox_relay.stop()
         await kafka_producer.stop()
         logger.info("Kafka producer and consumer stopped.")
     except Exception as e:
         logger.error(f"Error stopping Kafka producer or consumer: {e}")
+    password_hasher.shutdown()
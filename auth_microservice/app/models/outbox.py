@@ -0,0 +1,27 @@
+import datetime
+
+from sqlalchemy import BigInteger, Column, DateTime, Index, String
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.models.base import Base
+
+
+class OutboxEvent(Base):
+    """
+    An event waiting to be published to Kafka, written in the same
+    transaction as the change it describes.
+    """
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    topic = Column(String, nullable=False)
+    key = Column(String, nullable=True)
+    payload = Column(JSONB, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index(
+            "ix_outbox_event_pending",
+            "id",
+            postgresql_where=sent_at.is_(None),
+        ),
+    )
@@ -1,3 +1,4 @@
+from typing import List, Optional
 from uuid import UUID
 from pydantic import BaseModel
 
@@ -16,3 +17,12 @@ class UserCreate(BaseModel):
     username: str
     email: str
     password: str
+
+
+class UserBatchRequest(BaseModel):
+    ids: List[UUID]
+
+
+class UserBatchResponse(BaseModel):
+    users: List[Optional[User]]
+    missing: List[UUID]
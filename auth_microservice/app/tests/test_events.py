@@ -0,0 +1,58 @@
+import datetime
+import json
+
+import pytest
+
+from app.kafka_config.events import (
+    HEADER_CONTENT_TYPE,
+    HEADER_SCHEMA_VERSION,
+    EventEnvelope,
+    JsonCodec,
+    MsgpackCodec,
+    UnsupportedEventError,
+)
+
+PAYLOAD = {"user_id": "1", "username": "user", "tags": ["a", "b"]}
+
+
+@pytest.mark.parametrize("codec", [JsonCodec, MsgpackCodec])
+def test_envelope_round_trip(codec):
+    produced_at = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    event = EventEnvelope(event_type="user_created", payload=PAYLOAD, produced_at=produced_at)
+
+    value, headers = event.encode(codec)
+    decoded = EventEnvelope.decode(value, headers)
+
+    assert dict(headers)[HEADER_CONTENT_TYPE] == codec.content_type.encode()
+    assert decoded == event
+
+
+def test_decode_legacy_headerless_event():
+    value = json.dumps({"type": "user_created", **PAYLOAD}).encode()
+
+    decoded = EventEnvelope.decode(value, None)
+
+    assert decoded.event_type == "user_created"
+    assert decoded.payload == PAYLOAD
+    assert decoded.version == 0
+
+
+def test_decode_rejects_unknown_version():
+    value, headers = EventEnvelope(event_type="user_created", payload=PAYLOAD).encode()
+    headers = [
+        (key, b"99" if key == HEADER_SCHEMA_VERSION else data) for key, data in headers
+    ]
+
+    with pytest.raises(UnsupportedEventError):
+        EventEnvelope.decode(value, headers)
+
+
+def test_decode_rejects_unknown_content_type():
+    value, headers = EventEnvelope(event_type="user_created", payload=PAYLOAD).encode()
+    headers = [
+        (key, b"application/xml" if key == HEADER_CONTENT_TYPE else data)
+        for key, data in headers
+    ]
+
+    with pytest.raises(UnsupportedEventError):
+        EventEnvelope.decode(value, headers)
@@ -0,0 +1,70 @@
+import logging
+import time
+
+import pytest
+
+from app.core.security import PasswordHasher, TokenCache
+
+
+def test_token_cache_hit_and_miss():
+    cache = TokenCache(max_size=10)
+    claims = {"user_id": "1", "exp": time.time() + 60}
+
+    assert cache.get("token") is None
+    cache.set("token", claims)
+
+    assert cache.get("token") == claims
+    assert cache.stats() == {"size": 1, "hits": 1, "misses": 1}
+
+
+def test_token_cache_drops_expired_claims():
+    cache = TokenCache(max_size=10)
+    cache.set("token", {"user_id": "1", "exp": time.time() - 1})
+
+    assert cache.get("token") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_token_cache_evicts_least_recently_used():
+    cache = TokenCache(max_size=2)
+    exp = time.time() + 60
+    cache.set("first", {"user_id": "1", "exp": exp})
+    cache.set("second", {"user_id": "2", "exp": exp})
+    cache.get("first")
+    cache.set("third", {"user_id": "3", "exp": exp})
+
+    assert cache.get("second") is None
+    assert cache.get("first") is not None
+
+
+def test_token_cache_invalidate():
+    cache = TokenCache(max_size=10)
+    exp = time.time() + 60
+    cache.set("first", {"user_id": "1", "exp": exp})
+    cache.set("second", {"user_id": "2", "exp": exp})
+
+    cache.invalidate("first")
+    assert cache.get("first") is None
+    assert cache.get("second") is not None
+
+    cache.invalidate()
+    assert cache.get("second") is None
+
+
+class SlowContext:
+    def verify(self, plain_password: str, hashed_password: str) -> bool:
+        time.sleep(0.002)
+        return plain_password == hashed_password
+
+
+@pytest.mark.asyncio
+async def test_password_hasher_warns_when_verify_exceeds_target(caplog):
+    hasher = PasswordHasher(SlowContext(), workers=2, queue_limit=0, verify_target_ms=1)
+
+    with caplog.at_level(logging.WARNING, logger="app.core.security"):
+        for _ in range(PasswordHasher.VERIFY_SAMPLES):
+            assert await hasher.verify("secret", "secret")
+    hasher.shutdown()
+
+    assert hasher.verify_p99_ms() >= 1
+    assert "above the 1ms target" in caplog.text
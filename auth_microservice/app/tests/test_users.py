@@ -1,3 +1,5 @@
+import uuid
+
 import pytest
 
 from sqlalchemy.ext.asyncio import AsyncSession, AsyncConnection
@@ -30,6 +32,42 @@ async def test_list_users(
         assert "id" in user
 
 
+@pytest.mark.asyncio
+async def test_list_users_paginated(
+    client: AsyncSession,
+    session: AsyncConnection,
+    user_token_headers: dict[str, str],
+) -> None:
+    """Test that users can be listed page by page with a cursor."""
+    user_1 = UserFactory(username="charly", hashed_password="124567")
+    user_2 = UserFactory(username="jazz", hashed_password="124567")
+    session.add_all([user_1, user_2])
+    await session.commit()
+
+    response = await client.get(
+        "/api/v1/users/", params={"limit": 2, "order_by": "username"},
+        headers=user_token_headers,
+    )
+    first_page = response.json()
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = await client.get(
+        "/api/v1/users/",
+        params={"limit": 2, "order_by": "username", "cursor": cursor},
+        headers=user_token_headers,
+    )
+    second_page = response.json()
+
+    assert response.status_code == 200
+    assert len(first_page) == 2
+    assert len(second_page) == 1
+    assert "X-Next-Cursor" not in response.headers
+    usernames = [user["username"] for user in first_page + second_page]
+    assert usernames == sorted(usernames)
+    for user in second_page:
+        assert "hashed_password" not in user
+
+
 @pytest.mark.asyncio
 async def test_list_users_without_authorization(client: AsyncSession, session: AsyncConnection):
     users = [UserFactory(username="charly", hashed_password="124567"), 
@@ -76,6 +114,26 @@ async def test_get_user_by_id(client: AsyncSession, session: AsyncConnection, he
     assert data["id"] == user.id
 
 
+@pytest.mark.asyncio
+async def test_get_users_by_ids(client: AsyncSession, session: AsyncConnection, user_token_headers: dict[str, str]):
+    user_1 = UserFactory(username="charly", hashed_password="124567")
+    user_2 = UserFactory(username="jazz", hashed_password="124567")
+    session.add_all([user_1, user_2])
+    await session.commit()
+    missing_id = str(uuid.uuid4())
+
+    response = await client.post(
+        "/api/v1/users/batch",
+        json={"ids": [str(user_2.id), missing_id, str(user_1.id)]},
+        headers=user_token_headers,
+    )
+    data = response.json()
+
+    assert response.status_code == 200
+    assert [user and user["username"] for user in data["users"]] == ["jazz", None, "charly"]
+    assert data["missing"] == [missing_id]
+
+
 @pytest.mark.asyncio
 async def test_get_user_by_id_unauthorized(client: AsyncSession, session: AsyncConnection, headers: dict[str, str]):
     user = UserFactory(username="charly", hashed_password="124567")
@@ -0,0 +1,95 @@
+"""Login latency under concurrent load
+
+Signs up a benchmark user, then fires logins and health checks at a running
+auth service at the same time and reports p50/p99 latency for both. With
+bcrypt on the event loop, health check latency tracks the bcrypt cost; off
+the loop it stays flat.
+
+Usage:
+    python -m benchmarks.login_latency --url http://localhost:8000 \
+        --logins 200 --health 2000 --concurrency 32
+
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+
+def percentile(samples: list[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def report(name: str, samples: list[float], errors: int):
+    print(
+        f"{name:<8} n={len(samples):<6} errors={errors:<5} "
+        f"mean={statistics.fmean(samples) * 1000 if samples else 0:8.1f}ms "
+        f"p50={percentile(samples, 0.50) * 1000:8.1f}ms "
+        f"p99={percentile(samples, 0.99) * 1000:8.1f}ms"
+    )
+
+
+async def worker(client: httpx.AsyncClient, requests: asyncio.Queue,
+                 samples: dict, errors: dict):
+    while True:
+        try:
+            name, method, path, kwargs = requests.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        started = time.perf_counter()
+        response = await client.request(method, path, **kwargs)
+        elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            errors[name] += 1
+        else:
+            samples[name].append(elapsed)
+
+
+async def main(args):
+    username = f"bench-{uuid.uuid4().hex[:8]}"
+    password = uuid.uuid4().hex
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        response = await client.post(
+            "/auth/api/v1/users/",
+            json={"username": username, "email": f"{username}@example.com", "password": password},
+        )
+        response.raise_for_status()
+
+        requests: asyncio.Queue = asyncio.Queue()
+        login = ("login", "POST", "/auth/api/v1/login/",
+                 {"data": {"username": username, "password": password}})
+        health = ("health", "GET", "/auth/api/health/", {})
+        # Interleave so both kinds of request are in flight together
+        total = args.logins + args.health
+        for i in range(total):
+            if i * args.logins // total != (i + 1) * args.logins // total:
+                requests.put_nowait(login)
+            else:
+                requests.put_nowait(health)
+
+        samples = {"login": [], "health": []}
+        errors = {"login": 0, "health": 0}
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            worker(client, requests, samples, errors) for _ in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+    print(f"{total} requests in {elapsed:.2f}s with concurrency {args.concurrency}")
+    for name in ("login", "health"):
+        report(name, samples[name], errors[name])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--health", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,161 @@
+"""Kafka producer throughput per configuration
+
+Sends user_created-sized events through KafkaProducer with several
+linger/batch/compression/acks settings and reports events per second, both
+awaiting each delivery and fire-and-forget.
+
+By default the events go to an in-process stand-in broker that batches per
+partition like the real client: a batch is flushed when it is full or its
+linger time is up, gzip batches are really compressed, and every flush
+costs one simulated round trip unless acks=0. Pass --bootstrap to run
+against a real broker instead, e.g. the compose one on localhost:9094.
+
+Usage:
+    python -m benchmarks.producer_throughput [--events 20000] [--rtt-ms 1]
+    python -m benchmarks.producer_throughput --bootstrap localhost:9094
+
+"""
+import argparse
+import asyncio
+import gzip
+import time
+import uuid
+from collections import defaultdict
+from functools import partial
+
+from app.kafka_config.kafka_producer import KafkaProducer
+
+PARTITIONS = 6
+
+CONFIGS = [
+    # linger_ms, max_batch_size, compression_type, acks
+    (0, 16384, "none", "all"),
+    (5, 65536, "none", "all"),
+    (5, 65536, "gzip", "all"),
+    (20, 262144, "none", "all"),
+    (5, 65536, "none", 1),
+    (5, 65536, "none", 0),
+]
+
+
+class StandInProducer:
+    """
+    Minimal in-process replacement for AIOKafkaProducer.
+    """
+
+    def __init__(self, rtt: float, bootstrap_servers, linger_ms, max_batch_size,
+                 compression_type, acks) -> None:
+        self.rtt = rtt
+        self.linger = linger_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.compression_type = compression_type
+        self.acks = acks
+        self.batches = defaultdict(list)
+        self.sizes = defaultdict(int)
+        self.timers = {}
+        self.flushes = set()
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        for partition in list(self.batches):
+            self._flush(partition)
+        await asyncio.gather(*self.flushes)
+
+    async def send(self, topic, value, key=None, headers=None):
+        partition = hash(key) % PARTITIONS
+        future = asyncio.get_running_loop().create_future()
+        self.batches[partition].append((value, future))
+        self.sizes[partition] += len(value)
+        if self.sizes[partition] >= self.max_batch_size or not self.linger:
+            self._flush(partition)
+        elif partition not in self.timers:
+            self.timers[partition] = asyncio.get_running_loop().call_later(
+                self.linger, self._flush, partition
+            )
+        return future
+
+    def _flush(self, partition):
+        timer = self.timers.pop(partition, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self.batches.pop(partition, [])
+        self.sizes.pop(partition, None)
+        if batch:
+            task = asyncio.ensure_future(self._deliver(batch))
+            self.flushes.add(task)
+            task.add_done_callback(self.flushes.discard)
+
+    async def _deliver(self, batch):
+        payload = b"".join(value for value, _ in batch)
+        if self.compression_type == "gzip":
+            payload = gzip.compress(payload)
+        if self.acks != 0:
+            await asyncio.sleep(self.rtt)
+        for _, future in batch:
+            future.set_result(None)
+
+
+def make_event() -> tuple[str, dict]:
+    user_id = str(uuid.uuid4())
+    return user_id, {
+        "type": "user_created",
+        "user": {
+            "id": user_id,
+            "username": f"user-{user_id[:8]}",
+            "email": f"user-{user_id[:8]}@example.com",
+            "is_active": True,
+        },
+    }
+
+
+async def run(producer: KafkaProducer, events: list, wait: bool) -> float:
+    await producer.start()
+    started = time.perf_counter()
+    if wait:
+        for key, event in events:
+            await (await producer.send("bench_user_events", event, key=key))
+    else:
+        deliveries = [
+            await producer.send("bench_user_events", event, key=key) for key, event in events
+        ]
+        await asyncio.gather(*deliveries)
+    elapsed = time.perf_counter() - started
+    await producer.stop()
+    return len(events) / elapsed
+
+
+async def main(args):
+    events = [make_event() for _ in range(args.events)]
+    print(f"{'linger':>6} {'batch':>7} {'codec':>5} {'acks':>4} "
+          f"{'awaited ev/s':>13} {'fire&forget ev/s':>17}")
+    for linger_ms, max_batch_size, compression_type, acks in CONFIGS:
+        results = []
+        for wait in (True, False):
+            kwargs = dict(
+                linger_ms=linger_ms,
+                max_batch_size=max_batch_size,
+                compression_type=compression_type,
+                acks=acks,
+            )
+            if args.bootstrap:
+                producer = KafkaProducer(bootstrap_servers=args.bootstrap, **kwargs)
+            else:
+                producer = KafkaProducer(
+                    producer_factory=partial(StandInProducer, args.rtt_ms / 1000), **kwargs
+                )
+            # Awaiting each delivery is bounded by linger + RTT per event
+            sample = events[:args.awaited_events] if wait else events
+            results.append(await run(producer, sample, wait))
+        print(f"{linger_ms:>6} {max_batch_size:>7} {compression_type:>5} {acks!s:>4} "
+              f"{results[0]:>13.0f} {results[1]:>17.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--awaited-events", type=int, default=200)
+    parser.add_argument("--rtt-ms", type=float, default=1.0)
+    parser.add_argument("--bootstrap", default=None)
+    asyncio.run(main(parser.parse_args()))
@@ -1,7 +1,13 @@
 const API_URL = "http://localhost:8002/chat/api/v1";
 
-export const get_chat_messages = async (chatId, token) => {
-    const response = await fetch(`${API_URL}/${chatId}/messages?token=${token}`);
+// Pages are newest first; pass the ID of the oldest loaded message as
+// `before` to get the previous page
+export const get_chat_messages = async (chatId, token, before = null, limit = 50) => {
+    const params = new URLSearchParams({ token, limit });
+    if (before) {
+      params.set('before', before);
+    }
+    const response = await fetch(`${API_URL}/${chatId}/messages?${params}`);
     if (!response.ok) {
       throw new Error('Failed to fetch messages');
     }
@@ -6,8 +6,12 @@ import { useParams, Link } from 'react-router-dom';
 import { get_profile } from '../api/Profile';
 import { get_chat_messages } from '../api/Chat';
 
+const PAGE_SIZE = 50;
+
 const ChatPage = () => {
   const [messages, setMessages] = useState([]);
+  const [hasOlder, setHasOlder] = useState(false);
+  const [loadingOlder, setLoadingOlder] = useState(false);
   const [newMessage, setNewMessage] = useState('');
   const userId = getUserId();
   const [username, setUsername] = useState('');
@@ -19,6 +23,46 @@ const ChatPage = () => {
   const ws = useRef(null);
   const token = getToken();
   const profilesCache = useRef(new Map());
+  const skipScroll = useRef(false);
+
+  const withProfiles = async (messages) => {
+    const senderIds = Array.from(new Set(messages.map(message => message.sender_id)));
+    await Promise.all(senderIds.map(async (senderId) => {
+      if (!profilesCache.current.has(senderId)) {
+        const profile = await get_profile(senderId);
+        profilesCache.current.set(senderId, profile);
+      }
+    }));
+    return messages.map(message => {
+      const profile = profilesCache.current.get(message.sender_id);
+      return {
+        ...message,
+        senderName: profile.name,
+        senderProfilePicture: profile.profile_picture_url,
+      };
+    });
+  };
+
+  const fetchPage = async (before = null) => {
+    // History is served newest first
+    const page = await get_chat_messages(chatId, token, before, PAGE_SIZE);
+    setHasOlder(page.length === PAGE_SIZE);
+    return withProfiles(page.reverse());
+  };
+
+  const handleLoadOlder = async () => {
+    if (messages.length === 0) return;
+    setLoadingOlder(true);
+    try {
+      const older = await fetchPage(messages[0].id);
+      skipScroll.current = true;
+      setMessages((prevMessages) => [...older, ...prevMessages]);
+    } catch (error) {
+      console.error('Error fetching older messages:', error);
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
 
   useEffect(() => {
     const fetchProfile = async () => {
@@ -35,41 +79,16 @@ const ChatPage = () => {
   }, [userId]);
 
   useEffect(() => {
-    const fetchProfiles = async (senderIds) => {
-      const profilePromises = senderIds.map(async (senderId) => {
-        if (!profilesCache.current.has(senderId)) {
-          const profile = await get_profile(senderId);
-          profilesCache.current.set(senderId, profile);
-        }
-        return profilesCache.current.get(senderId);
-      });
-
-      await Promise.all(profilePromises);
-    };
-
     const fetchMessages = async () => {
       try {
-        const messages = await get_chat_messages(chatId, token);
-        const senderIds = Array.from(new Set(messages.map(message => message.sender_id)));
-
-        await fetchProfiles(senderIds);
-
-        const messagesWithProfiles = messages.map(message => {
-          const profile = profilesCache.current.get(message.sender_id);
-          return {
-            ...message,
-            senderName: profile.name,
-            senderProfilePicture: profile.profile_picture_url,
-          };
-        });
-
-        setMessages(messagesWithProfiles);
+        setMessages(await fetchPage());
       } catch (error) {
         console.error('Error fetching messages:', error);
       }
     };
 
     fetchMessages();
+    // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [chatId, token]);
 
   useEffect(() => {
@@ -86,19 +105,23 @@ const ChatPage = () => {
       };
 
       ws.current.onmessage = async (event) => {
-        const message = JSON.parse(event.data);
-
-        if (message.chat_id !== chatId) {
-          return; // Ignore messages from other chats
-        }
-
-        if (!profilesCache.current.has(message.sender_id)) {
-          const profile = await get_profile(message.sender_id);
-          profilesCache.current.set(message.sender_id, profile);
+        const data = JSON.parse(event.data);
+        // A slow connection may receive a coalesced backlog as one array frame
+        const batch = Array.isArray(data) ? data : [data];
+
+        for (const message of batch) {
+          if (message.chat_id !== chatId) {
+            continue; // Ignore messages from other chats
+          }
+
+          if (!profilesCache.current.has(message.sender_id)) {
+            const profile = await get_profile(message.sender_id);
+            profilesCache.current.set(message.sender_id, profile);
+          }
+
+          const { name: senderName, profile_picture_url: senderProfilePicture } = profilesCache.current.get(message.sender_id);
+          setMessages((prevMessages) => [...prevMessages, { ...message, senderName, senderProfilePicture }]);
         }
-
-        const { name: senderName, profile_picture_url: senderProfilePicture } = profilesCache.current.get(message.sender_id);
-        setMessages((prevMessages) => [...prevMessages, { ...message, senderName, senderProfilePicture }]);
       };
     };
 
@@ -123,6 +146,11 @@ const ChatPage = () => {
   };
 
   useEffect(() => {
+    if (skipScroll.current) {
+      // Older messages were prepended; stay where the user is
+      skipScroll.current = false;
+      return;
+    }
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
   }, [messages]);
 
@@ -136,6 +164,13 @@ const ChatPage = () => {
           </Box>
         </Flex>
         <Box flex="1" overflowY="auto" p="4" borderWidth="1px" borderRadius="lg">
+          {hasOlder && (
+            <Flex justify="center" mb="4">
+              <Button size="sm" onClick={handleLoadOlder} isLoading={loadingOlder}>
+                Load older messages
+              </Button>
+            </Flex>
+          )}
           {messages.map(({ senderName, senderProfilePicture, content, timestamp, sender_id }, index) => (
             <HStack key={index} align="start" mb="4" bg={index % 2 === 0 ? 'blue.100' : 'gray.100'} p="4" borderRadius="lg">
               <Avatar name={senderName} src={`data:image/jpeg;base64,${senderProfilePicture}`} />
@@ -1,7 +1,27 @@
 from fastapi import APIRouter, Depends
 
+from app.kafka_config.fanout import fanout_bus
+from app.websocket.manager import manager
+
 router = APIRouter(prefix="/health", tags=["Health"])
 
 @router.get("/", status_code=200)
 async def health():
     return 1
+
+
+@router.get("/websocket", status_code=200)
+async def websocket_stats():
+    """
+    Outbound WebSocket queue depth and slow-consumer counters of this node.
+    """
+    return manager.stats()
+
+
+@router.get("/fanout", status_code=200)
+async def fanout_stats():
+    """
+    Whether cross-node fan-out is up; while it is down this node only
+    delivers to its own clients.
+    """
+    return {"connected": fanout_bus.connected, "restarts": fanout_bus.restarts}
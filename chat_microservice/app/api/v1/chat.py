@@ -1,34 +1,48 @@
 import json
+import logging
 from fastapi import APIRouter, Depends, Query, WebSocket, WebSocketDisconnect, HTTPException
-from typing import List
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from pydantic import ValidationError
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from app.core.config import settings
 from app.core.database import get_database
-from app.models.chat import Chat
+from app.core.message_batcher import message_batcher
+from app.models.chat import Chat, participants_key
 from app.models.message import Message
 from app.core.security import auth_validator
+from app.kafka_config.fanout import fanout_bus
 from app.websocket.manager import manager
 from app.schemas.chat import ChatCreate
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(tags=["Chats"])
 
 
 @router.post("/", response_model=Chat)
 async def create_chat(chat_data: ChatCreate, token: str, db=Depends(get_database)):
     """
-    Create a new chat.
+    Create a chat, or return the existing chat of the same participants.
 
     Args:
         chat_data (ChatCreate): The data required to create a chat.
         token (str): The authentication token.
 
     Returns:
-        Chat: The created chat object.
+        Chat: The created or existing chat object.
     """
     user_id = await auth_validator.validate_token(token)
-    participants = list(set(chat_data.participants + [user_id]))
-    participants.sort()
-    chat = Chat(participants=participants)
-    await db["chats"].insert_one(chat.dict())
-    return chat
+    participants = sorted(set(chat_data.participants + [user_id]))
+    key = participants_key(participants)
+    chat = Chat(participants=participants, participants_key=key)
+    document = await db["chats"].find_one_and_update(
+        {"participants_key": key},
+        {"$setOnInsert": chat.dict()},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return document
 
 
 @router.get("/", response_model=List[Chat])
@@ -44,12 +58,11 @@ async def get_chat_by_participants(participants: str, token: str, db=Depends(get
         List[Chat]: A list of chat objects.
     """
     user_id = await auth_validator.validate_token(token)
-    participants_list = sorted(participants.split(",") + [user_id])
-    chat_cursor = db["chats"].find({"participants": participants_list})
-    chats = await chat_cursor.to_list(length=None)
-    if not chats:
+    key = participants_key(participants.split(",") + [user_id])
+    chat = await db["chats"].find_one({"participants_key": key})
+    if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
-    return chats
+    return [chat]
 
 
 @router.post("/messages/", response_model=Message)
@@ -68,8 +81,8 @@ async def send_message(chat_id: str, content: str, token: str, db=Depends(get_da
     user_id = await auth_validator.validate_token(token)
     message = Message(chat_id=chat_id, sender_id=user_id, content=content)
     await db["messages"].insert_one(message.dict())
-    await db["chats"].update_one({"_id": chat_id}, {"$push": {"messages": message.id}})
-    await manager.broadcast(json.dumps(message.dict()))
+    await db["chats"].update_one({"id": chat_id}, Chat.summary_update(message))
+    await fanout_bus.publish(chat_id, json.dumps(message.dict()))
     return message
 
 
@@ -83,38 +96,96 @@ async def websocket_endpoint(websocket: WebSocket, chat_id: str, token: str, db=
         token (str): The authentication token.
     """
     user_id = await auth_validator.validate_token(token)
-    await manager.connect(websocket)
+    await manager.connect(websocket, chat_id)
     try:
         while True:
             data = await websocket.receive_text()
-            message_data = json.loads(data)
-            message_data["sender_id"] = user_id
-            message_data["chat_id"] = chat_id
-            message = Message(**message_data)
-            await db["messages"].insert_one(message.dict())
-            await db["chats"].update_one({"id": chat_id}, {"$push": {"messages": message.id}})
-            await manager.broadcast(json.dumps(message.dict()))
+            try:
+                message_data = json.loads(data)
+                if not isinstance(message_data, dict):
+                    raise ValueError("Message must be a JSON object")
+                # IDs are server-generated ObjectIds; history is ordered
+                # and paged by them
+                message_data.pop("id", None)
+                message_data["sender_id"] = user_id
+                message_data["chat_id"] = chat_id
+                message = Message(**message_data)
+            except (ValueError, ValidationError) as e:
+                # A bad frame is dropped, the connection stays open
+                logger.warning(f"Invalid message from {user_id} in chat {chat_id}: {e}")
+                continue
+            await message_batcher.submit(message)
+            await fanout_bus.publish(chat_id, json.dumps(message.dict()))
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
-        print("Client disconnected")
+        logger.info(f"Client {user_id} disconnected from chat {chat_id}")
+    finally:
+        await manager.disconnect(websocket, chat_id)
 
 
 @router.get("/{chat_id}/messages", response_model=List[Message])
-async def get_chat_messages(chat_id: str, token: str = Query(...), db=Depends(get_database)):
+async def get_chat_messages(
+        chat_id: str,
+        token: str = Query(...),
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+        limit: Optional[int] = Query(None, ge=1, le=settings.CHAT_HISTORY_MAX_PAGE_SIZE),
+        stream: bool = False,
+        db=Depends(get_database),
+):
     """
-    Retrieve messages from a chat.
+    Retrieve messages from a chat, newest first.
+
+    Pages are cursored on message IDs: pass the ID of the oldest message
+    received as `before` to get older messages, or the newest one as
+    `after` to get messages sent since.
 
     Args:
         chat_id (str): The ID of the chat.
         token (str): The authentication token.
+        before (Optional[str]): Only return messages older than this ID.
+        after (Optional[str]): Only return messages newer than this ID.
+        limit (Optional[int]): Page size. Unbounded in streaming mode
+            unless given.
+        stream (bool): Stream the messages as NDJSON instead of returning
+            a single page.
 
     Returns:
-        List[Message]: A list of message objects.
+        List[Message]: A page of message objects.
     """
     user_id = await auth_validator.validate_token(token)
-    chat = await db["chats"].find_one({"id": chat_id, "participants": user_id})
+    chat = await db["chats"].find_one({"id": chat_id, "participants": user_id}, {"_id": 1})
     if not chat:
         raise HTTPException(status_code=403, detail="You are not a participant of this chat")
-    messages_cursor = db["messages"].find({"chat_id": chat_id})
-    messages = await messages_cursor.to_list(length=None)
-    return messages
+
+    query = {"chat_id": chat_id}
+    id_range = {}
+    if before is not None:
+        id_range["$lt"] = before
+    if after is not None:
+        id_range["$gt"] = after
+    if id_range:
+        query["id"] = id_range
+
+    if stream:
+        return StreamingResponse(
+            _stream_messages(db, query, limit), media_type="application/x-ndjson"
+        )
+
+    limit = limit or settings.CHAT_HISTORY_PAGE_SIZE
+    if after is not None and before is None:
+        # Read forward from the cursor so the page starts right after it
+        messages_cursor = db["messages"].find(query, {"_id": 0}).sort("id", ASCENDING).limit(limit)
+        messages = await messages_cursor.to_list(length=limit)
+        messages.reverse()
+        return messages
+    messages_cursor = db["messages"].find(query, {"_id": 0}).sort("id", DESCENDING).limit(limit)
+    return await messages_cursor.to_list(length=limit)
+
+
+async def _stream_messages(db, query: dict, limit: Optional[int]):
+    messages_cursor = db["messages"].find(query, {"_id": 0}).sort("id", DESCENDING)
+    messages_cursor.batch_size(settings.CHAT_HISTORY_STREAM_BATCH_SIZE)
+    if limit:
+        messages_cursor.limit(limit)
+    async for message in messages_cursor:
+        yield json.dumps(message) + "\n"
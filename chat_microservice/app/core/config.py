@@ -5,9 +5,24 @@ class Settings(BaseSettings):
     PROJECT_NAME: str
     MONGO_URI: str
     DATABASE_NAME: str = "chat_db"
+    MONGO_CHECK_QUERY_PLANS: bool = False
     SECRET_KEY: str = "12345689"
     ACCESS_TOKEN_EXPIRE_MINUTES: str = "300"
+    TOKEN_CACHE_SIZE: int = 10000
     ALGORITHM: str = "HS256"
+    WS_SEND_QUEUE_SIZE: int = 256
+    WS_OVERFLOW_POLICY: str = "drop_oldest"
+    CHAT_HISTORY_PAGE_SIZE: int = 50
+    CHAT_HISTORY_MAX_PAGE_SIZE: int = 200
+    CHAT_HISTORY_STREAM_BATCH_SIZE: int = 500
+    # Group commit of WebSocket messages: a batch is flushed after this many
+    # milliseconds or once it holds MESSAGE_BATCH_MAX_SIZE messages
+    MESSAGE_BATCH_MAX_DELAY_MS: int = 5
+    MESSAGE_BATCH_MAX_SIZE: int = 100
+    KAFKA_BOOTSTRAP_SERVERS: str = "kafka:9092"
+    CHAT_FANOUT_TOPIC: str = "chat_messages"
+    # "kafka" for multi-node deployments, "memory" for a single process
+    CHAT_FANOUT_BACKEND: str = "kafka"
 
     class Config:
         env_file = "../.env"
@@ -0,0 +1,105 @@
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+from pymongo import ASCENDING, DESCENDING
+
+logger = logging.getLogger(__name__)
+
+
+class IndexSpec(BaseModel):
+    collection: str
+    keys: List[Tuple[str, int]]
+    name: str
+    unique: bool = False
+    sparse: bool = False
+
+
+class QueryShape(BaseModel):
+    collection: str
+    filter: Dict[str, Any]
+    sort: Optional[List[Tuple[str, int]]] = None
+
+
+# Every index the chat service relies on. Add an entry here together with
+# any new query shape; indexes are created at startup.
+INDEXES: List[IndexSpec] = [
+    IndexSpec(
+        collection="messages",
+        keys=[("chat_id", ASCENDING), ("id", DESCENDING)],
+        name="chat_id_id",
+    ),
+    IndexSpec(collection="chats", keys=[("id", ASCENDING)], name="id", unique=True),
+    IndexSpec(collection="chats", keys=[("participants", ASCENDING)], name="participants"),
+    IndexSpec(
+        collection="chats",
+        keys=[("participants_key", ASCENDING)],
+        name="participants_key",
+        unique=True,
+        sparse=True,
+    ),
+]
+
+# Representative queries issued by the API, used to check that each one is
+# served by an index.
+QUERY_SHAPES: List[QueryShape] = [
+    QueryShape(
+        collection="messages",
+        filter={"chat_id": "chat", "id": {"$lt": "message"}},
+        sort=[("id", DESCENDING)],
+    ),
+    QueryShape(
+        collection="messages",
+        filter={"chat_id": "chat", "id": {"$gt": "message"}},
+        sort=[("id", ASCENDING)],
+    ),
+    QueryShape(collection="chats", filter={"id": "chat", "participants": "user"}),
+    QueryShape(collection="chats", filter={"participants_key": "key"}),
+]
+
+
+async def ensure_indexes(db, indexes: List[IndexSpec] = INDEXES):
+    """
+    Create the registered indexes. Existing indexes are left untouched, so
+    this is safe to run on every startup.
+    """
+    for index in indexes:
+        await db[index.collection].create_index(
+            index.keys, name=index.name, unique=index.unique, sparse=index.sparse
+        )
+    logger.info(f"Ensured {len(indexes)} MongoDB indexes.")
+
+
+def _plan_stages(plan: dict):
+    yield plan.get("stage")
+    if "inputStage" in plan:
+        yield from _plan_stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+
+async def uses_index(db, shape: QueryShape) -> bool:
+    """
+    Check whether the winning plan for a query avoids a collection scan.
+    """
+    cursor = db[shape.collection].find(shape.filter)
+    if shape.sort:
+        cursor = cursor.sort(shape.sort)
+    explain = await cursor.explain()
+    plan = explain["queryPlanner"]["winningPlan"]
+    return "COLLSCAN" not in _plan_stages(plan)
+
+
+async def check_query_plans(db, shapes: List[QueryShape] = QUERY_SHAPES) -> List[QueryShape]:
+    """
+    Return the query shapes that would run without an index, logging each.
+    """
+    unindexed = []
+    for shape in shapes:
+        if not await uses_index(db, shape):
+            logger.warning(
+                f"Query on '{shape.collection}' runs without an index: "
+                f"filter={shape.filter} sort={shape.sort}"
+            )
+            unindexed.append(shape)
+    return unindexed
@@ -0,0 +1,130 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.core.config import settings
+from app.core.database import get_database
+from app.models.chat import Chat
+from app.models.message import Message
+
+logger = logging.getLogger(__name__)
+
+Pending = Tuple[Message, asyncio.Future]
+
+
+class MessageBatcher:
+    """
+    Write-behind batcher that group-commits messages from all sockets.
+
+    Messages are collected for up to `max_delay_ms` or until `max_size` of
+    them are pending, then stored with a single `insert_many` and one
+    `bulk_write` of chat summary updates. Each sender is released only once
+    its batch has been written.
+    """
+
+    def __init__(
+            self,
+            db,
+            max_size: int = settings.MESSAGE_BATCH_MAX_SIZE,
+            max_delay_ms: int = settings.MESSAGE_BATCH_MAX_DELAY_MS,
+    ) -> None:
+        self.db = db
+        self.max_size = max_size
+        self.max_delay = max_delay_ms / 1000
+        self._pending: List[Pending] = []
+        self._timer: Optional[asyncio.Task] = None
+        self._flushes: set = set()
+
+    async def submit(self, message: Message):
+        """
+        Queue a message and wait until its batch is durable.
+
+        Args:
+            message (Message): The message to store.
+
+        Raises:
+            Exception: The database error if the message was not stored.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((message, future))
+        if len(self._pending) >= self.max_size:
+            self._schedule_flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+        await future
+
+    async def close(self):
+        """
+        Flush whatever is pending and wait for in-flight batches.
+        """
+        if self._pending:
+            self._schedule_flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.max_delay)
+        self._timer = None
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.create_task(self._flush(batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, batch: List[Pending]):
+        stored = len(batch)
+        error: Optional[Exception] = None
+        try:
+            await self.db["messages"].insert_many(
+                [message.dict() for message, _ in batch], ordered=True
+            )
+        except BulkWriteError as e:
+            # Ordered inserts stop at the first failure
+            stored = e.details["writeErrors"][0]["index"]
+            error = e
+        except Exception as e:
+            stored = 0
+            error = e
+
+        if stored:
+            try:
+                await self._update_summaries([message for message, _ in batch[:stored]])
+            except Exception as e:
+                logger.error(f"Error updating chat summaries: {e}")
+
+        for index, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if index < stored:
+                future.set_result(None)
+            else:
+                future.set_exception(error)
+
+    async def _update_summaries(self, messages: List[Message]):
+        latest: Dict[str, Message] = {}
+        counts: Dict[str, int] = {}
+        for message in messages:
+            latest[message.chat_id] = message
+            counts[message.chat_id] = counts.get(message.chat_id, 0) + 1
+        now = datetime.utcnow()
+        await self.db["chats"].bulk_write(
+            [
+                UpdateOne({"id": chat_id}, Chat.summary_update(message, now, counts[chat_id]))
+                for chat_id, message in latest.items()
+            ],
+            ordered=False,
+        )
+
+
+message_batcher = MessageBatcher(get_database())
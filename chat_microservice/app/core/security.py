@@ -1,3 +1,8 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional
+
 from jose import jwt
 from passlib.context import CryptContext
 
@@ -11,14 +16,79 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 MESSAGE_GET_TOKEN_DATA_403 = 'Could not validate credentials'
 
 
+class TokenCache:
+    """
+    Bounded LRU cache of decoded JWT claims, keyed by token digest.
+
+    Entries are dropped once their `exp` has passed, so an expired token is
+    never served from the cache. Tokens without `exp` are not cached.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        claims = self._entries.get(key)
+        if claims is None or claims["exp"] <= time.time():
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return claims
+
+    def set(self, token: str, claims: dict):
+        if not isinstance(claims.get("exp"), (int, float)):
+            return
+        key = self._key(token)
+        self._entries[key] = claims
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, token: Optional[str] = None):
+        """
+        Drop one token from the cache, or every token if none is given.
+        """
+        if token is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(self._key(token), None)
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
 class TokenPayload(BaseModel):
     user_id: str
 
 
 class AuthValidator:
-    def __init__(self, secret_key: str, algorithms: list[str]) -> None:
+    def __init__(self, secret_key: str, algorithms: list[str], cache_size: int = 10000) -> None:
         self._secret_key = secret_key
         self._algorithms = algorithms
+        self.token_cache = TokenCache(cache_size)
+
+    def decode(self, encoded_token: str) -> dict:
+        """
+        Decode and verify a JWT token, reusing cached claims for repeat callers.
+
+        Raises:
+            jwt.JWTError: If the token is invalid or expired.
+        """
+        claims = self.token_cache.get(encoded_token)
+        if claims is None:
+            claims = jwt.decode(encoded_token, self._secret_key, algorithms=self._algorithms)
+            self.token_cache.set(encoded_token, claims)
+        return claims
 
     async def validate_token(self, encoded_token: str):
         """
@@ -34,9 +104,7 @@ class AuthValidator:
             TokenPayload: The decoded payload of the token.
         """
         try:
-            decoded_token = jwt.decode(
-                encoded_token, self._secret_key, algorithms=self._algorithms
-            )
+            decoded_token = self.decode(encoded_token)
             return decoded_token["user_id"]
         except jwt.JWTError:
             raise HTTPException(status_code=403, detail="Invalid token")
@@ -46,11 +114,11 @@ class AuthValidator:
             token: str
     ) -> TokenPayload:
         try:
-            decoded_token = jwt.decode(token, self._secret_key, algorithms=self._algorithms)
+            decoded_token = self.decode(token)
             token_data = TokenPayload(**decoded_token)
         except (jwt.JWTError, ValidationError) as error:
             raise HTTPException(status_code=403, detail=str(error))
         return token_data
 
 
-auth_validator = AuthValidator(settings.SECRET_KEY, [settings.ALGORITHM])
+auth_validator = AuthValidator(settings.SECRET_KEY, [settings.ALGORITHM], settings.TOKEN_CACHE_SIZE)
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, List, Optional, Tuple
+
+from aiokafka import AIOKafkaConsumer, AIOKafkaProducer
+
+from app.core.config import settings
+from app.websocket.manager import ConnectionManager, manager
+
+logger = logging.getLogger(__name__)
+
+Record = Tuple[str, str]
+
+
+class KafkaTransport:
+    """
+    Publishes chat messages to a Kafka topic keyed by chat ID and reads
+    every partition of it back.
+
+    The consumer has no group, so each chat node sees every message and
+    starts from the latest offset.
+    """
+
+    def __init__(self, bootstrap_servers: str, topic: str) -> None:
+        self.bootstrap_servers = bootstrap_servers
+        self.topic = topic
+        self.producer: Optional[AIOKafkaProducer] = None
+        self.consumer: Optional[AIOKafkaConsumer] = None
+
+    async def start(self):
+        self.producer = AIOKafkaProducer(bootstrap_servers=self.bootstrap_servers)
+        self.consumer = AIOKafkaConsumer(
+            self.topic,
+            bootstrap_servers=self.bootstrap_servers,
+            group_id=None,
+            auto_offset_reset="latest",
+        )
+        await self.producer.start()
+        try:
+            await self.consumer.start()
+        except Exception:
+            await self.producer.stop()
+            self.producer = None
+            self.consumer = None
+            raise
+
+    async def stop(self):
+        if self.consumer:
+            await self.consumer.stop()
+            self.consumer = None
+        if self.producer:
+            await self.producer.stop()
+            self.producer = None
+
+    async def send(self, key: str, value: str):
+        await self.producer.send_and_wait(
+            self.topic, key=key.encode("utf-8"), value=value.encode("utf-8")
+        )
+
+    async def records(self) -> AsyncIterator[Record]:
+        async for msg in self.consumer:
+            yield msg.key.decode("utf-8"), msg.value.decode("utf-8")
+
+
+class InMemoryBroker:
+    """
+    In-process stand-in for the Kafka topic.
+
+    Every transport created from the same broker behaves like a separate
+    chat node subscribed to the topic.
+    """
+
+    def __init__(self) -> None:
+        self.subscribers: List[asyncio.Queue] = []
+
+    def transport(self) -> "InMemoryTransport":
+        return InMemoryTransport(self)
+
+
+class InMemoryTransport:
+    def __init__(self, broker: InMemoryBroker) -> None:
+        self.broker = broker
+        self.queue: Optional[asyncio.Queue] = None
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self.broker.subscribers.append(self.queue)
+
+    async def stop(self):
+        if self.queue is not None:
+            self.broker.subscribers.remove(self.queue)
+            self.queue = None
+
+    async def send(self, key: str, value: str):
+        for queue in self.broker.subscribers:
+            queue.put_nowait((key, value))
+
+    async def records(self) -> AsyncIterator[Record]:
+        while True:
+            yield await self.queue.get()
+
+
+class FanoutBus:
+    """
+    Cross-node fan-out of persisted chat messages.
+
+    Messages are published to the transport and delivered to local
+    subscribers only when read back, so a node never delivers the same
+    message twice.
+
+    The transport is supervised: it is (re)started with exponential
+    backoff whenever it cannot be started or its consumer fails. While it
+    is down, messages are delivered to the local subscribers only.
+    """
+
+    def __init__(
+            self,
+            transport,
+            connection_manager: ConnectionManager,
+            retry_backoff: float = 0.5,
+            retry_backoff_max: float = 30.0,
+    ) -> None:
+        self.transport = transport
+        self.manager = connection_manager
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_max = retry_backoff_max
+        self.connected = False
+        self.restarts = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._supervise())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Chat fan-out bus stopped.")
+
+    async def publish(self, chat_id: str, message: str):
+        """
+        Publish a persisted message to every chat node.
+
+        Falls back to delivering to the local subscribers when the
+        transport is down, so a node keeps serving its own clients.
+
+        Args:
+            chat_id (str): The ID of the chat, used as the partition key.
+            message (str): The serialized message.
+        """
+        if self.connected:
+            try:
+                await self.transport.send(chat_id, message)
+                return
+            except Exception as e:
+                logger.error(f"Error publishing message to chat {chat_id}: {e}")
+        await self.manager.broadcast(chat_id, message)
+
+    async def _supervise(self):
+        delay = self.retry_backoff
+        while True:
+            started = time.monotonic()
+            try:
+                await self.transport.start()
+                self.connected = True
+                logger.info("Chat fan-out bus started.")
+                await self._consume()
+                logger.error("Chat fan-out consumer stopped, restarting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Chat fan-out bus failed, delivering locally: {e}")
+            finally:
+                self.connected = False
+                try:
+                    await self.transport.stop()
+                except Exception as e:
+                    logger.error(f"Error stopping chat fan-out transport: {e}")
+            self.restarts += 1
+            if time.monotonic() - started > self.retry_backoff_max:
+                delay = self.retry_backoff
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.retry_backoff_max)
+
+    async def _consume(self):
+        async for chat_id, message in self.transport.records():
+            try:
+                await self.manager.broadcast(chat_id, message)
+            except Exception as e:
+                logger.error(f"Error delivering message to chat {chat_id}: {e}")
+            # Let connection writers drain between records of a fetched batch
+            await asyncio.sleep(0)
+
+
+def create_transport():
+    if settings.CHAT_FANOUT_BACKEND == "memory":
+        return InMemoryBroker().transport()
+    return KafkaTransport(settings.KAFKA_BOOTSTRAP_SERVERS, settings.CHAT_FANOUT_TOPIC)
+
+
+fanout_bus = FanoutBus(create_transport(), manager)
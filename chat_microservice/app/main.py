@@ -4,6 +4,10 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import router
 from app.core.config import settings
+from app.core.database import get_database
+from app.core.indexes import check_query_plans, ensure_indexes
+from app.core.message_batcher import message_batcher
+from app.kafka_config.fanout import fanout_bus
 
 logger = logging.getLogger(__name__)
 
@@ -22,3 +26,29 @@ def create_application() -> FastAPI:
 
 
 app = create_application()
+
+
+@app.on_event("startup")
+async def startup():
+    db = get_database()
+    try:
+        await ensure_indexes(db)
+        if settings.MONGO_CHECK_QUERY_PLANS:
+            await check_query_plans(db)
+    except Exception as e:
+        logger.error(f"Error ensuring MongoDB indexes: {e}")
+    logger.info("Starting chat fan-out bus...")
+    try:
+        await fanout_bus.start()
+    except Exception as e:
+        logger.error(f"Error starting chat fan-out bus: {e}")
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await message_batcher.close()
+    logger.info("Stopping chat fan-out bus...")
+    try:
+        await fanout_bus.stop()
+    except Exception as e:
+        logger.error(f"Error stopping chat fan-out bus: {e}")
@@ -1,10 +1,56 @@
 # models.py
+import hashlib
+from datetime import datetime
 from pydantic import BaseModel, Field
 from typing import List, Optional
 from bson import ObjectId
 
+from app.models.message import Message
+
+MESSAGE_PREVIEW_LENGTH = 100
+
+
+def participants_key(participants: List[str]) -> str:
+    """
+    Canonical key of a participant set, independent of order and repeats.
+
+    Args:
+        participants (List[str]): The participant IDs.
+
+    Returns:
+        str: A SHA-256 hex digest of the sorted, de-duplicated IDs.
+    """
+    canonical = "\n".join(sorted(set(participants)))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
 
 class Chat(BaseModel):
     id: Optional[str] = Field(default_factory=lambda: str(ObjectId()))
     participants: List[str]
-    messages: List[str] = []
+    participants_key: Optional[str] = None
+    last_message_id: Optional[str] = None
+    last_message_preview: Optional[str] = None
+    message_count: int = 0
+    last_activity_at: Optional[datetime] = None
+
+    @staticmethod
+    def summary_update(message: Message, at: Optional[datetime] = None, count: int = 1) -> dict:
+        """
+        Build the update that records new messages in the chat summary.
+
+        Args:
+            message (Message): The latest message that was just stored.
+            at (Optional[datetime]): The activity time. Defaults to now.
+            count (int): How many messages were stored.
+
+        Returns:
+            dict: A `$set`/`$inc` update document for the chats collection.
+        """
+        return {
+            "$set": {
+                "last_message_id": message.id,
+                "last_message_preview": message.content[:MESSAGE_PREVIEW_LENGTH],
+                "last_activity_at": at or datetime.utcnow(),
+            },
+            "$inc": {"message_count": count},
+        }
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from app.kafka_config.fanout import FanoutBus, InMemoryBroker, InMemoryTransport
+from app.websocket.manager import ConnectionManager
+
+
+class FakeWebSocket:
+    def __init__(self) -> None:
+        self.received = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data: str):
+        self.received.append(data)
+
+
+class FlakyTransport(InMemoryTransport):
+    """
+    Fails to start the first time, like Kafka being unreachable at boot.
+    """
+
+    def __init__(self, broker: InMemoryBroker) -> None:
+        super().__init__(broker)
+        self.failures = 1
+
+    async def start(self):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("broker unreachable")
+        await super().start()
+
+
+async def wait_until(predicate, timeout: float = 1.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_fanout_delivers_to_subscribers_of_every_node():
+    broker = InMemoryBroker()
+    nodes = [ConnectionManager(), ConnectionManager()]
+    buses = [FanoutBus(broker.transport(), node) for node in nodes]
+    for bus in buses:
+        await bus.start()
+    await wait_until(lambda: all(bus.connected for bus in buses))
+
+    first, second, other_chat = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    await nodes[0].connect(first, "chat-1")
+    await nodes[1].connect(second, "chat-1")
+    await nodes[1].connect(other_chat, "chat-2")
+
+    await buses[0].publish("chat-1", '"hello"')
+    await wait_until(lambda: first.received and second.received)
+    await asyncio.sleep(0.05)
+
+    assert first.received == ['"hello"']
+    assert second.received == ['"hello"']
+    assert other_chat.received == []
+
+    for bus in buses:
+        await bus.stop()
+    for node, websocket, chat_id in (
+        (nodes[0], first, "chat-1"), (nodes[1], second, "chat-1"), (nodes[1], other_chat, "chat-2")
+    ):
+        await node.disconnect(websocket, chat_id)
+
+
+@pytest.mark.asyncio
+async def test_fanout_delivers_locally_while_transport_is_down():
+    node = ConnectionManager()
+    bus = FanoutBus(InMemoryBroker().transport(), node)
+    websocket = FakeWebSocket()
+    await node.connect(websocket, "chat-1")
+
+    await bus.publish("chat-1", '"hello"')
+    await wait_until(lambda: websocket.received)
+
+    assert websocket.received == ['"hello"']
+    await node.disconnect(websocket, "chat-1")
+
+
+@pytest.mark.asyncio
+async def test_fanout_retries_start():
+    bus = FanoutBus(FlakyTransport(InMemoryBroker()), ConnectionManager(), retry_backoff=0.01)
+    await bus.start()
+
+    await wait_until(lambda: bus.connected)
+
+    assert bus.restarts == 1
+    await bus.stop()
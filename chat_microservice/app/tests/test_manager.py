@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from app.websocket.manager import SLOW_CONSUMER_CLOSE_CODE, ConnectionManager, OverflowPolicy
+
+
+class FakeWebSocket:
+    def __init__(self) -> None:
+        self.received = []
+        self.close_code = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data: str):
+        self.received.append(data)
+
+    async def close(self, code: int):
+        self.close_code = code
+
+
+async def wait_until(predicate, timeout: float = 1.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+# The writer tasks only run once the test yields to the event loop, so
+# messages broadcast back to back pile up in the outbound queues.
+
+
+@pytest.mark.asyncio
+async def test_drop_oldest_discards_the_oldest_message():
+    manager = ConnectionManager(max_queue_size=2, policy=OverflowPolicy.DROP_OLDEST)
+    websocket = FakeWebSocket()
+    await manager.connect(websocket, "chat-1")
+
+    for message in ("1", "2", "3"):
+        await manager.broadcast("chat-1", message)
+    await wait_until(lambda: len(websocket.received) == 2)
+
+    assert websocket.received == ["2", "3"]
+    assert manager.stats()["dropped"] == 1
+
+
+@pytest.mark.asyncio
+async def test_coalesce_merges_backlog_into_one_array_frame():
+    manager = ConnectionManager(max_queue_size=2, policy=OverflowPolicy.COALESCE)
+    websocket = FakeWebSocket()
+    await manager.connect(websocket, "chat-1")
+
+    for message in ("1", "2", "3", "4"):
+        await manager.broadcast("chat-1", message)
+    await wait_until(lambda: len(websocket.received) == 2)
+
+    # The backlog is trimmed to the queue size before being merged
+    assert websocket.received == ["[2,3]", "4"]
+    stats = manager.stats()
+    assert stats["coalesced"] == 1
+    assert stats["dropped"] == 1
+    assert stats["evicted"] == 0
+
+
+@pytest.mark.asyncio
+async def test_disconnect_policy_evicts_slow_consumer():
+    manager = ConnectionManager(max_queue_size=1, policy=OverflowPolicy.DISCONNECT)
+    slow, other = FakeWebSocket(), FakeWebSocket()
+    await manager.connect(slow, "chat-1")
+
+    await manager.broadcast("chat-1", "1")
+    await manager.broadcast("chat-1", "2")
+
+    assert slow.close_code == SLOW_CONSUMER_CLOSE_CODE
+    assert "chat-1" not in manager.rooms
+    assert slow not in manager.connections
+    stats = manager.stats()
+    assert stats["evicted"] == 1
+    assert stats["connections"] == 0
+
+    await manager.connect(other, "chat-1")
+    await manager.broadcast("chat-1", "3")
+    await wait_until(lambda: other.received)
+    assert other.received == ["3"]
+    assert slow.received == []
@@ -0,0 +1,95 @@
+import asyncio
+from typing import Optional
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+from app.core.message_batcher import MessageBatcher
+from app.models.message import Message
+
+
+class FakeCollection:
+    def __init__(self) -> None:
+        self.calls = []
+        self.release: Optional[asyncio.Event] = None
+        self.error: Optional[Exception] = None
+
+    async def insert_many(self, documents, ordered=True):
+        self.calls.append(documents)
+        if self.release is not None:
+            await self.release.wait()
+        if self.error is not None:
+            raise self.error
+
+    async def bulk_write(self, requests, ordered=True):
+        self.calls.append(requests)
+
+
+class FakeDatabase(dict):
+    def __init__(self) -> None:
+        super().__init__(messages=FakeCollection(), chats=FakeCollection())
+
+
+def make_message(content: str, chat_id: str = "chat-1") -> Message:
+    return Message(chat_id=chat_id, sender_id="user-1", content=content)
+
+
+@pytest.mark.asyncio
+async def test_flushes_when_batch_is_full():
+    db = FakeDatabase()
+    batcher = MessageBatcher(db, max_size=2, max_delay_ms=60000)
+
+    await asyncio.wait_for(
+        asyncio.gather(batcher.submit(make_message("a")), batcher.submit(make_message("b"))),
+        timeout=1,
+    )
+
+    assert [[doc["content"] for doc in docs] for docs in db["messages"].calls] == [["a", "b"]]
+    assert len(db["chats"].calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_flushes_after_max_delay():
+    db = FakeDatabase()
+    batcher = MessageBatcher(db, max_size=100, max_delay_ms=10)
+
+    await asyncio.wait_for(batcher.submit(make_message("a")), timeout=1)
+
+    assert len(db["messages"].calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_senders_wait_for_insert():
+    db = FakeDatabase()
+    db["messages"].release = asyncio.Event()
+    batcher = MessageBatcher(db, max_size=1, max_delay_ms=60000)
+
+    sender = asyncio.ensure_future(batcher.submit(make_message("a")))
+    await asyncio.sleep(0.01)
+    assert db["messages"].calls
+    assert not sender.done()
+
+    db["messages"].release.set()
+    await asyncio.wait_for(sender, timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_senders_after_failed_insert_get_the_error():
+    db = FakeDatabase()
+    db["messages"].error = BulkWriteError({"writeErrors": [{"index": 1, "code": 11000}]})
+    batcher = MessageBatcher(db, max_size=3, max_delay_ms=60000)
+
+    results = await asyncio.wait_for(
+        asyncio.gather(
+            *(batcher.submit(make_message(content)) for content in "abc"),
+            return_exceptions=True,
+        ),
+        timeout=1,
+    )
+
+    assert results[0] is None
+    assert isinstance(results[1], BulkWriteError)
+    assert isinstance(results[2], BulkWriteError)
+    # Only the stored message is counted in the chat summary
+    (updates,) = db["chats"].calls
+    assert len(updates) == 1
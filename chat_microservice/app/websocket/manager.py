@@ -1,21 +1,201 @@
-from typing import List
+import asyncio
+import logging
+from enum import Enum
+from typing import Dict, List, Optional, Set
 from fastapi import WebSocket
 
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Close code sent to consumers evicted for not keeping up (RFC 6455 "Try Again Later").
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+class OverflowPolicy(str, Enum):
+    DROP_OLDEST = "drop_oldest"
+    COALESCE = "coalesce"
+    DISCONNECT = "disconnect"
+
+
+class Connection:
+    """
+    A WebSocket with a bounded outbound queue drained by its own writer task.
+
+    Queue items are lists of frames: a single message is sent as is, while a
+    coalesced backlog is sent as one JSON array frame.
+    """
+
+    def __init__(self, websocket: WebSocket, max_size: int, policy: OverflowPolicy) -> None:
+        self.websocket = websocket
+        self.max_size = max_size
+        self.policy = policy
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self.dropped = 0
+        self.coalesced = 0
+        self.closed = False
+        self._writer: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._writer = asyncio.create_task(self._drain())
+
+    async def stop(self):
+        self.closed = True
+        if self._writer is not None:
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize()
+
+    def enqueue(self, message: str) -> bool:
+        """
+        Queue a message for delivery without waiting on the socket.
+
+        Args:
+            message (str): The serialized message.
+
+        Returns:
+            bool: False if the queue is full and the policy is to disconnect.
+        """
+        if self.closed:
+            return False
+        if not self.queue.full():
+            self.queue.put_nowait([message])
+            return True
+        if self.policy == OverflowPolicy.DISCONNECT:
+            return False
+        if self.policy == OverflowPolicy.DROP_OLDEST:
+            self.dropped += len(self.queue.get_nowait())
+            self.queue.put_nowait([message])
+            return True
+        frames: List[str] = []
+        while not self.queue.empty():
+            frames.extend(self.queue.get_nowait())
+        frames.append(message)
+        overflow = len(frames) - self.max_size
+        if overflow > 0:
+            self.dropped += overflow
+            frames = frames[overflow:]
+        self.coalesced += 1
+        self.queue.put_nowait(frames)
+        return True
+
+    async def _drain(self):
+        try:
+            while True:
+                frames = await self.queue.get()
+                if len(frames) == 1:
+                    await self.websocket.send_text(frames[0])
+                else:
+                    await self.websocket.send_text("[" + ",".join(frames) + "]")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info(f"WebSocket writer stopped: {e}")
+            self.closed = True
+
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    def __init__(
+            self,
+            max_queue_size: int = settings.WS_SEND_QUEUE_SIZE,
+            policy: OverflowPolicy = OverflowPolicy(settings.WS_OVERFLOW_POLICY),
+    ):
+        self.max_queue_size = max_queue_size
+        self.policy = policy
+        self.rooms: Dict[str, Set[WebSocket]] = {}
+        self.connections: Dict[WebSocket, Connection] = {}
+        self.evicted = 0
+        self.dropped = 0
+        self.coalesced = 0
+
+    async def connect(self, websocket: WebSocket, chat_id: str):
+        """
+        Accept a WebSocket and subscribe it to a chat.
 
-    async def connect(self, websocket: WebSocket):
+        Args:
+            websocket (WebSocket): The client connection.
+            chat_id (str): The ID of the chat to listen to.
+        """
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.subscribe(chat_id, websocket)
+
+    async def disconnect(self, websocket: WebSocket, chat_id: str):
+        self.unsubscribe(chat_id, websocket)
+        connection = self.connections.pop(websocket, None)
+        if connection is not None:
+            self._collect(connection)
+            await connection.stop()
+
+    def subscribe(self, chat_id: str, websocket: WebSocket):
+        if websocket not in self.connections:
+            connection = Connection(websocket, self.max_queue_size, self.policy)
+            connection.start()
+            self.connections[websocket] = connection
+        self.rooms.setdefault(chat_id, set()).add(websocket)
+
+    def unsubscribe(self, chat_id: str, websocket: WebSocket):
+        room = self.rooms.get(chat_id)
+        if room is None:
+            return
+        room.discard(websocket)
+        if not room:
+            del self.rooms[chat_id]
+
+    async def broadcast(self, chat_id: str, message: str):
+        """
+        Queue a message for every local subscriber of a chat.
+
+        Slow consumers are handled according to the overflow policy; closed
+        or evicted connections are unsubscribed.
+
+        Args:
+            chat_id (str): The ID of the chat.
+            message (str): The serialized message.
+        """
+        evicted = []
+        for websocket in list(self.rooms.get(chat_id, ())):
+            connection = self.connections.get(websocket)
+            if connection is None or not connection.enqueue(message):
+                evicted.append(websocket)
+        for websocket in evicted:
+            connection = self.connections.get(websocket)
+            if connection is not None and not connection.closed:
+                self.evicted += 1
+                logger.warning(f"Evicting slow WebSocket consumer in chat {chat_id}")
+                try:
+                    await websocket.close(code=SLOW_CONSUMER_CLOSE_CODE)
+                except Exception:
+                    pass
+            await self.disconnect(websocket, chat_id)
 
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+    def stats(self) -> dict:
+        """
+        Report outbound queue depth and overflow counters for this node.
+        """
+        depths = [connection.depth for connection in self.connections.values()]
+        live = self.connections.values()
+        return {
+            "connections": len(self.connections),
+            "rooms": len(self.rooms),
+            "queue_size": self.max_queue_size,
+            "policy": self.policy.value,
+            "queue_depth_total": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+            "evicted": self.evicted,
+            "dropped": self.dropped + sum(c.dropped for c in live),
+            "coalesced": self.coalesced + sum(c.coalesced for c in live),
+        }
 
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
+    def _collect(self, connection: Connection):
+        self.dropped += connection.dropped
+        self.coalesced += connection.coalesced
 
 
 manager = ConnectionManager()
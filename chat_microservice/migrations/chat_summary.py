@@ -0,0 +1,74 @@
+"""Replace the Chat.messages array with the chat summary fields
+
+Recomputes last_message_id, last_message_preview, message_count and
+last_activity_at for every chat from the messages collection, then drops
+the embedded `messages` array.
+
+Usage:
+    python -m migrations.chat_summary
+
+"""
+import asyncio
+import datetime
+import logging
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.core.database import get_database
+from app.models.chat import MESSAGE_PREVIEW_LENGTH
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+async def upgrade(db):
+    summaries = db["messages"].aggregate([
+        {"$sort": {"chat_id": 1, "id": 1}},
+        {"$group": {
+            "_id": "$chat_id",
+            "message_count": {"$sum": 1},
+            "last_message_id": {"$last": "$id"},
+            "last_message_content": {"$last": "$content"},
+        }},
+    ], allowDiskUse=True)
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    requests = []
+    async for summary in summaries:
+        last_message_id = summary["last_message_id"]
+        # Clients could once choose message IDs, which are not ObjectIds
+        if ObjectId.is_valid(last_message_id):
+            last_activity_at = ObjectId(last_message_id).generation_time
+        else:
+            last_activity_at = now
+        requests.append(UpdateOne(
+            {"id": summary["_id"]},
+            {
+                "$set": {
+                    "last_message_id": summary["last_message_id"],
+                    "last_message_preview": summary["last_message_content"][:MESSAGE_PREVIEW_LENGTH],
+                    "message_count": summary["message_count"],
+                    "last_activity_at": last_activity_at,
+                },
+                "$unset": {"messages": ""},
+            },
+        ))
+        if len(requests) >= BATCH_SIZE:
+            await db["chats"].bulk_write(requests, ordered=False)
+            requests = []
+    if requests:
+        await db["chats"].bulk_write(requests, ordered=False)
+
+    # Chats without any message
+    await db["chats"].update_many(
+        {"messages": {"$exists": True}},
+        {"$set": {"message_count": 0}, "$unset": {"messages": ""}},
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(upgrade(get_database()))
+    logger.info("Chat summaries migrated.")
@@ -0,0 +1,67 @@
+"""Add participants_key to chats and merge duplicate chats
+
+Computes the canonical participants_key of every chat. Chats that share a
+key are merged into the oldest one: their messages are moved over, the
+summaries combined, and the duplicates deleted.
+
+Must run after migrations.chat_summary.
+
+Usage:
+    python -m migrations.participants_key
+
+"""
+import asyncio
+import logging
+from typing import Dict, List
+
+from pymongo import UpdateOne
+
+from app.core.database import get_database
+from app.core.indexes import ensure_indexes
+from app.models.chat import participants_key
+
+logger = logging.getLogger(__name__)
+
+
+def _merge(chats: List[dict]) -> dict:
+    chats = sorted(chats, key=lambda chat: chat["id"])
+    latest = max(chats, key=lambda chat: chat.get("last_message_id") or "")
+    return {
+        "last_message_id": latest.get("last_message_id"),
+        "last_message_preview": latest.get("last_message_preview"),
+        "last_activity_at": latest.get("last_activity_at"),
+        "message_count": sum(chat.get("message_count", 0) for chat in chats),
+    }
+
+
+async def upgrade(db):
+    groups: Dict[str, List[dict]] = {}
+    async for chat in db["chats"].find({}, {"_id": 0, "id": 1, "participants": 1,
+                                            "last_message_id": 1, "last_message_preview": 1,
+                                            "last_activity_at": 1, "message_count": 1}):
+        groups.setdefault(participants_key(chat["participants"]), []).append(chat)
+
+    requests = []
+    merged = 0
+    for key, chats in groups.items():
+        chats.sort(key=lambda chat: chat["id"])
+        canonical, duplicates = chats[0], chats[1:]
+        update = {"participants_key": key}
+        if duplicates:
+            duplicate_ids = [chat["id"] for chat in duplicates]
+            await db["messages"].update_many(
+                {"chat_id": {"$in": duplicate_ids}}, {"$set": {"chat_id": canonical["id"]}}
+            )
+            await db["chats"].delete_many({"id": {"$in": duplicate_ids}})
+            update.update(_merge(chats))
+            merged += len(duplicates)
+        requests.append(UpdateOne({"id": canonical["id"]}, {"$set": update}))
+    if requests:
+        await db["chats"].bulk_write(requests, ordered=False)
+    logger.info(f"Keyed {len(groups)} chats, merged {merged} duplicates.")
+    await ensure_indexes(db)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(upgrade(get_database()))
@@ -0,0 +1,53 @@
+import datetime
+import hashlib
+from typing import Any, Iterable, Optional
+
+from fastapi import HTTPException
+
+
+def make_etag(id: Any, updated_at: Optional[datetime.datetime]) -> str:
+    """
+    Strong ETag of a row version.
+    """
+    version = f"{id}:{updated_at.isoformat() if updated_at else ''}"
+    return '"' + hashlib.sha256(version.encode()).hexdigest()[:32] + '"'
+
+
+def make_list_etag(etags: Iterable[str]) -> str:
+    """
+    Strong ETag of a list, derived from the ETags of its items.
+    """
+    digest = hashlib.sha256()
+    for etag in etags:
+        digest.update(etag.encode())
+    return '"' + digest.hexdigest()[:32] + '"'
+
+
+def _parse(header: str) -> list[str]:
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def none_match(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether a GET should be answered normally, i.e. not with 304.
+    If-None-Match uses the weak comparison.
+    """
+    if if_none_match is None:
+        return True
+    tags = [tag.removeprefix("W/") for tag in _parse(if_none_match)]
+    return "*" not in tags and etag not in tags
+
+
+def check_if_match(if_match: Optional[str], etag: str):
+    """
+    Raise 412 unless the If-Match header, if any, matches the current
+    version. If-Match uses the strong comparison, so weak tags never match.
+
+    Raises:
+        HTTPException: If the resource changed since the client read it.
+    """
+    if if_match is None:
+        return
+    tags = _parse(if_match)
+    if "*" not in tags and etag not in tags:
+        raise HTTPException(status_code=412, detail="Profile has been modified")
@@ -7,6 +7,8 @@ from starlette.responses import Response
 from sqlalchemy.sql import text
 
 from app.api.deps import get_session
+from app.core.cache import profile_cache
+from app.kafka_config.kafka_consumer import kafka_consumer
 
 router = APIRouter(prefix="/health", tags=["Health"])
 
@@ -18,3 +20,19 @@ async def health(session: AsyncSession = Depends(get_session)):
     except (asyncio.TimeoutError, socket.gaierror):
         return Response(status_code=503)
     return Response(status_code=200)
+
+
+@router.get("/kafka", status_code=200)
+async def kafka_consumer_stats():
+    """
+    Per-partition consumer lag and processing time of this replica.
+    """
+    return kafka_consumer.stats()
+
+
+@router.get("/cache", status_code=200)
+async def profile_cache_stats():
+    """
+    Hit rate and size of the profile cache of this replica.
+    """
+    return profile_cache.stats()
@@ -1,7 +1,14 @@
-from typing import List
+import base64
+import datetime
+import json
+from typing import List, Optional, Tuple
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException
-from app.schemas.profiles import ProfileResponse, ProfileUpdate
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from app.api.etag import check_if_match, make_etag, make_list_etag, none_match
+from app.core.config import settings
+from app.schemas.profiles import (
+    ProfileBatchRequest, ProfileBatchResponse, ProfileResponse, ProfileUpdate
+)
 from app.api.deps import get_session
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.controllers import profile_controller
@@ -9,53 +16,174 @@ from app.controllers import profile_controller
 profile_router = APIRouter()
 
 
-@profile_router.get("/{user_id}", response_model=ProfileResponse)
+NOT_MODIFIED = {304: {"description": "Not modified"}}
+
+
+@profile_router.get(
+    "/{user_id}", response_model=ProfileResponse, responses=NOT_MODIFIED
+)
 async def get_profile_by_id(
     user_id: UUID,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     session: AsyncSession = Depends(get_session)
 ) -> ProfileResponse:
     """
-    Retrieves a profile by its ID.
+    Retrieves a profile by its ID, from the profile cache when possible.
+
+    A request with If-None-Match is checked against the current version
+    first, which only reads the user_id index.
 
     Args:
         user_id (UUID): The ID of the profile to retrieve.
+        if_none_match (Optional[str]): ETags the client already has.
 
     Returns:
-        ProfileResponse: The profile object matching the provided ID.
+        ProfileResponse: The profile object matching the provided ID,
+            or an empty 304 response if the client's copy is current.
 
     Raises:
         HTTPException: If the profile with the given ID is not found in
         the database.
     """
-    profile = await profile_controller.get_by_user_id(session, id=user_id)
+    version = None
+    if if_none_match is not None:
+        version = await profile_controller.get_version_by_user_id(session, user_id)
+        if version is None:
+            raise HTTPException(status_code=404, detail="Profile not found")
+        etag = make_etag(version.id, version.updated_at)
+        if not none_match(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+
+    profile = await profile_controller.get_cached_by_user_id(session, id=user_id)
     if profile is None:
         raise HTTPException(status_code=404, detail="Profile not found")
-    return ProfileResponse.from_orm(profile)
+    profile = ProfileResponse.model_validate(profile)
+    if version is not None and profile.updated_at != version.updated_at:
+        # The cached copy is older than the version just read, e.g. after a
+        # write on another replica
+        await profile_controller.invalidate_cached(user_id)
+        profile = await profile_controller.get_cached_by_user_id(session, id=user_id)
+        if profile is None:
+            raise HTTPException(status_code=404, detail="Profile not found")
+        profile = ProfileResponse.model_validate(profile)
+    response.headers["ETag"] = make_etag(profile.id, profile.updated_at)
+    return profile
+
 
+@profile_router.post("/batch", response_model=ProfileBatchResponse)
+async def get_profiles_by_user_ids(
+    batch: ProfileBatchRequest,
+    session: AsyncSession = Depends(get_session)
+) -> ProfileBatchResponse:
+    """
+    Retrieves the profiles of several users at once.
+
+    Cached profiles are served from the profile cache and the rest are
+    loaded in one query.
+
+    Args:
+        batch (ProfileBatchRequest): The user IDs, at most
+            PROFILES_BATCH_MAX_IDS.
 
-@profile_router.get("/", response_model=List[ProfileResponse])
+    Returns:
+        ProfileBatchResponse: The profiles in the order of the requested
+            IDs, with null for every user without a profile; those IDs are
+            also listed in `missing`.
+    """
+    if len(batch.user_ids) > settings.PROFILES_BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.PROFILES_BATCH_MAX_IDS} IDs can be requested at once",
+        )
+    profiles, missing = await profile_controller.get_many_by_user_ids(
+        session, batch.user_ids
+    )
+    return ProfileBatchResponse(profiles=profiles, missing=missing)
+
+
+@profile_router.get(
+    "/", response_model=List[ProfileResponse], responses=NOT_MODIFIED
+)
 async def get_profiles(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(
+        settings.PROFILES_PAGE_SIZE, ge=1, le=settings.PROFILES_MAX_PAGE_SIZE
+    ),
+    updated_after: Optional[datetime.datetime] = None,
+    updated_before: Optional[datetime.datetime] = None,
+    if_none_match: Optional[str] = Header(None),
     session: AsyncSession = Depends(get_session)
 ) -> List[ProfileResponse]:
     """
-    Retrieves all profiles.
+    Retrieves a page of profiles ordered by creation time.
 
-    Returns:
-        List[ProfileResponse]: The list of all profiles.
+    The cursor of the next page is returned in the X-Next-Cursor header
+    and is absent on the last page. For incremental sync, pass the time of
+    the previous sync as `updated_after`.
 
-    Raises:
-        HTTPException: If no profiles are found in the database.
+    Args:
+        cursor (Optional[str]): X-Next-Cursor of the previous page.
+        limit (int): Page size, at most PROFILES_MAX_PAGE_SIZE.
+        updated_after (Optional[datetime.datetime]): Only profiles updated
+            at or after this time.
+        updated_before (Optional[datetime.datetime]): Only profiles
+            updated before this time.
+        if_none_match (Optional[str]): ETags the client already has.
+
+    Returns:
+        List[ProfileResponse]: The profiles of the page, possibly none, or
+            an empty 304 response if none of them changed.
     """
-    profiles = await profile_controller.get_multi(session)
-    if not profiles:
-        raise HTTPException(status_code=404, detail="Profiles not found")
+    profiles = await profile_controller.get_page(
+        session,
+        after=_decode_cursor(cursor) if cursor is not None else None,
+        limit=limit,
+        updated_after=_to_utc(updated_after),
+        updated_before=_to_utc(updated_before),
+    )
+    headers = {
+        "ETag": make_list_etag(
+            make_etag(profile.id, profile.updated_at) for profile in profiles
+        )
+    }
+    if len(profiles) == limit:
+        last = profiles[-1]
+        headers["X-Next-Cursor"] = _encode_cursor(
+            [last.created_at.isoformat(), str(last.id)]
+        )
+    if not none_match(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
     return profiles
 
 
+def _to_utc(value: Optional[datetime.datetime]) -> Optional[datetime.datetime]:
+    # Timestamps are stored as naive UTC
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def _encode_cursor(values: List[str]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime.datetime, UUID]:
+    try:
+        created_at, id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.datetime.fromisoformat(created_at), UUID(id)
+    except (ValueError, TypeError, AttributeError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @profile_router.put("/{user_id}", response_model=ProfileResponse)
 async def update_profile(
     user_id: UUID,
     profile_update: ProfileUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     session: AsyncSession = Depends(get_session)
 ) -> ProfileResponse:
     """
@@ -63,29 +191,26 @@ async def update_profile(
 
     Args:
         user_id (UUID): The ID of the profile to update.
+        if_match (Optional[str]): ETag of the version the update is based
+            on.
 
     Returns:
         ProfileResponse: The updated profile object.
 
     Raises:
         HTTPException: If the profile with the given ID is
-            not found in the database.
+            not found in the database, or 412 if it no longer matches
+            If-Match.
     """
-    profile = await profile_controller.get_by_user_id(session, user_id)
-    if profile is None:
-        raise HTTPException(status_code=404, detail="Profile not found")
-
-    updated_profile = await profile_controller.update(
-        session, db_obj=profile, obj_in=profile_update
-    )
-
-    return ProfileResponse.from_orm(updated_profile)
+    return await _write_profile(session, user_id, profile_update, if_match, response)
 
 
 @profile_router.patch("/{user_id}", response_model=ProfileResponse)
 async def patch_profile(
     user_id: UUID,
     profile_update: ProfileUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     session: AsyncSession = Depends(get_session)
 ) -> ProfileResponse:
     """
@@ -93,19 +218,44 @@ async def patch_profile(
 
     Args:
         user_id (UUID): The ID of the profile to update.
+        if_match (Optional[str]): ETag of the version the update is based
+            on.
 
     Returns:
         ProfileResponse: The updated profile object.
 
     Raises:
         HTTPException: If the profile with the given ID is
-            not found in the database.
+            not found in the database, or 412 if it no longer matches
+            If-Match.
     """
-    profile = await profile_controller.get_by_user_id(session, user_id)
+    return await _write_profile(session, user_id, profile_update, if_match, response)
+
+
+async def _write_profile(
+    session: AsyncSession,
+    user_id: UUID,
+    profile_update: ProfileUpdate,
+    if_match: Optional[str],
+    response: Response,
+) -> ProfileResponse:
+    check_version = if_match is not None
+    expected_updated_at = None
+    if check_version:
+        version = await profile_controller.get_version_by_user_id(session, user_id)
+        if version is None:
+            raise HTTPException(status_code=404, detail="Profile not found")
+        check_if_match(if_match, make_etag(version.id, version.updated_at))
+        # The update only applies if nobody changed the row in between
+        expected_updated_at = version.updated_at
+
+    profile = await profile_controller.update_by_user_id(
+        session, user_id, obj_in=profile_update,
+        check_version=check_version, expected_updated_at=expected_updated_at,
+    )
     if profile is None:
+        if check_version:
+            raise HTTPException(status_code=412, detail="Profile has been modified")
         raise HTTPException(status_code=404, detail="Profile not found")
-    print(profile_update)
-    updated_profile = await profile_controller.patch(
-        session, db_obj=profile, obj_in=profile_update
-    )
-    return ProfileResponse.from_orm(updated_profile)
+    response.headers["ETag"] = make_etag(profile.id, profile.updated_at)
+    return ProfileResponse.from_orm(profile)
@@ -0,0 +1,93 @@
+"""Re-drive dead-lettered profile events
+
+Reads records from the dead-letter topic and publishes them back to the
+topic they came from, with the dead-letter headers removed, so that the
+profile consumer processes them again. Offsets of the dead-letter topic are
+committed only after the records are re-published. Inspect the records
+first with --dry-run.
+
+Usage:
+    python -m app.commands.redrive_dlq [--limit 100] [--dry-run] [--idle-ms 5000]
+
+"""
+import argparse
+import asyncio
+
+from aiokafka import AIOKafkaConsumer, AIOKafkaProducer
+
+from app.kafka_config.kafka_consumer import (
+    DLQ_HEADER_PREFIX, KAFKA_BOOTSTRAP_SERVERS, KAFKA_DLQ_TOPIC, TOPIC_NAME,
+)
+
+REDRIVE_GROUP_ID = "profile_service_dlq_redrive"
+
+
+def describe(msg) -> str:
+    headers = {key: value.decode(errors="replace") for key, value in msg.headers or ()}
+    error_type = headers.get(f"{DLQ_HEADER_PREFIX}error-type", "?")
+    error = headers.get(f"{DLQ_HEADER_PREFIX}error", "")
+    origin = (
+        f"{headers.get(f'{DLQ_HEADER_PREFIX}original-topic', '?')}-"
+        f"{headers.get(f'{DLQ_HEADER_PREFIX}original-partition', '?')}@"
+        f"{headers.get(f'{DLQ_HEADER_PREFIX}original-offset', '?')}"
+    )
+    return f"offset={msg.offset} from={origin} {error_type}: {error}"
+
+
+def strip_dlq_headers(headers) -> list:
+    return [
+        (key, value) for key, value in headers or ()
+        if not key.startswith(DLQ_HEADER_PREFIX)
+    ]
+
+
+async def redrive(limit: int, dry_run: bool, idle_ms: int) -> int:
+    consumer = AIOKafkaConsumer(
+        KAFKA_DLQ_TOPIC,
+        bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
+        group_id=REDRIVE_GROUP_ID,
+        enable_auto_commit=False,
+        auto_offset_reset="earliest",
+    )
+    producer = AIOKafkaProducer(bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS)
+    await consumer.start()
+    await producer.start()
+    count = 0
+    try:
+        while count < limit:
+            batches = await consumer.getmany(
+                timeout_ms=idle_ms, max_records=limit - count
+            )
+            if not batches:
+                break
+            for tp, records in batches.items():
+                for msg in records:
+                    print(describe(msg))
+                    if not dry_run:
+                        headers = dict(msg.headers or ())
+                        topic = headers.get(f"{DLQ_HEADER_PREFIX}original-topic")
+                        await producer.send_and_wait(
+                            topic.decode() if topic else TOPIC_NAME,
+                            msg.value,
+                            key=msg.key,
+                            headers=strip_dlq_headers(msg.headers),
+                        )
+                count += len(records)
+                if not dry_run:
+                    await consumer.commit({tp: records[-1].offset + 1})
+    finally:
+        await producer.stop()
+        await consumer.stop()
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--idle-ms", type=int, default=5000,
+                        help="stop after this long without new records")
+    args = parser.parse_args()
+    count = asyncio.run(redrive(args.limit, args.dry_run, args.idle_ms))
+    action = "Found" if args.dry_run else "Re-drove"
+    print(f"{action} {count} dead-lettered records")
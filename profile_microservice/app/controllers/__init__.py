@@ -1,4 +1,5 @@
 from app.controllers.profiles import ProfileModelController
+from app.core.cache import profile_cache
 from app.models.profiles import Profile as ProfileModel
 
-profile_controller = ProfileModelController(ProfileModel)
\ No newline at end of file
+profile_controller = ProfileModelController(ProfileModel, cache=profile_cache)
\ No newline at end of file
@@ -1,18 +1,121 @@
 import datetime
-from typing import Type, Any, List, Union, Dict, Optional
+from typing import Type, Any, List, Union, Dict, Optional, Sequence, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from fastapi.encoders import jsonable_encoder
+from sqlalchemy import any_, literal, tuple_, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.engine import Row
 from sqlalchemy.future import select
 
+from app.core.cache import ReadThroughCache
+from app.core.database import SessionLocal
+
 ModelType = Type[BaseModel]
 CreateSchemaType = Type[BaseModel]
 UpdateSchemaType = Type[BaseModel]
 
 
 class BaseModelController():
-    def __init__(self, model: Type[ModelType]):
+    def __init__(
+        self,
+        model: Type[ModelType],
+        cache: Optional[ReadThroughCache] = None,
+        cache_key: str = "user_id",
+    ):
+        """
+        Args:
+            model: SQLAlchemy model managed by the controller.
+            cache: Read-through cache of model rows keyed by the
+                `cache_key` column. Writes through the controller refresh
+                or invalidate it.
+            cache_key: Column the cache is keyed by.
+        """
         self.model = model
+        self.cache = cache
+        self.cache_key = cache_key
+
+    async def get_cached_by_user_id(
+        self, db: AsyncSession, id: Any
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Return the row with the given user ID as a dict, from the cache
+        when possible.
+
+        A cache miss is loaded on a session of its own: the load is shared
+        by every concurrent request for the same ID and must outlive the
+        request that started it.
+        """
+        if self.cache is None:
+            return await self._get_dict_by_cache_key(db, id)
+
+        async def load():
+            async with SessionLocal() as session:
+                return await self._get_dict_by_cache_key(session, id)
+
+        return await self.cache.get_or_load(str(id), load)
+
+    async def get_many_by_user_ids(
+        self, db: AsyncSession, ids: Sequence[Any]
+    ) -> Tuple[List[Optional[Dict[str, Any]]], List[Any]]:
+        """
+        Return the rows with the given user IDs as dicts, in the order of
+        `ids`, with None for every ID that does not exist.
+
+        Cached rows are served from the cache; the rest are loaded with a
+        single `user_id = ANY(...)` query.
+
+        Returns:
+            Tuple[List[Optional[Dict[str, Any]]], List[Any]]: The rows and
+                the IDs that were not found.
+        """
+        unique_ids = list(dict.fromkeys(ids))
+        found: Dict[str, Dict[str, Any]] = {}
+        generation = 0
+        if self.cache is not None:
+            generation = self.cache.generation
+            found = await self.cache.get_many([str(id) for id in unique_ids])
+        misses = [id for id in unique_ids if str(id) not in found]
+        if misses:
+            column = getattr(self.model, self.cache_key)
+            query = select(self.model).where(
+                column == any_(literal(misses, ARRAY(column.type)))
+            )
+            result = await db.execute(query)
+            loaded = {
+                str(getattr(db_obj, self.cache_key)): db_obj.dict()
+                for db_obj in result.scalars()
+            }
+            if self.cache is not None:
+                await self.cache.set_many(loaded, generation)
+            found.update(loaded)
+        return (
+            [found.get(str(id)) for id in ids],
+            [id for id in unique_ids if str(id) not in found],
+        )
+
+    async def _get_dict_by_cache_key(
+        self, db: AsyncSession, id: Any
+    ) -> Optional[Dict[str, Any]]:
+        column = getattr(self.model, self.cache_key)
+        result = await db.execute(select(self.model).where(column == id))
+        db_obj = result.scalars().first()
+        return db_obj.dict() if db_obj is not None else None
+
+    async def _refresh_cache(self, db_obj: ModelType):
+        if self.cache is not None:
+            key = str(getattr(db_obj, self.cache_key))
+            await self.cache.set(key, db_obj.dict())
+
+    async def _invalidate_cache(self, db_obj: ModelType):
+        await self.invalidate_cached(getattr(db_obj, self.cache_key))
+
+    async def invalidate_cached(self, id: Any):
+        """
+        Drop a cached row, e.g. one found to be older than the database.
+        """
+        if self.cache is not None:
+            await self.cache.invalidate(str(id))
 
     async def get(
         self, db: AsyncSession, id: Any
@@ -28,6 +131,19 @@ class BaseModelController():
         result = await db.execute(query)
         return result.scalars().first()
 
+    async def get_version_by_user_id(
+        self, db: AsyncSession, id: Any
+    ) -> Optional[Row]:
+        """
+        Return only the id and updated_at of a row, which is enough to
+        compute its ETag without loading it.
+        """
+        query = select(self.model.id, self.model.updated_at).where(
+            self.model.user_id == id
+        )
+        result = await db.execute(query)
+        return result.first()
+
     async def get_multi(
         self,
         db: AsyncSession,
@@ -39,6 +155,37 @@ class BaseModelController():
         result = await db.execute(query)
         return result.scalars().all()
 
+    async def get_page(
+        self,
+        db: AsyncSession,
+        *,
+        after: Optional[Tuple[datetime.datetime, Any]] = None,
+        limit: int = 100,
+        updated_after: Optional[datetime.datetime] = None,
+        updated_before: Optional[datetime.datetime] = None,
+    ) -> List[ModelType]:
+        """
+        Return a page of rows ordered by (created_at, id).
+
+        Args:
+            after: (created_at, id) of the last row of the previous page.
+            limit: Maximum number of rows.
+            updated_after: Only rows updated at or after this UTC time.
+            updated_before: Only rows updated before this UTC time.
+        """
+        keys = (self.model.created_at, self.model.id)
+        query = select(self.model).order_by(*keys).limit(limit)
+        if after is not None:
+            query = query.where(
+                tuple_(*keys) > tuple_(*(literal(v, key.type) for key, v in zip(keys, after)))
+            )
+        if updated_after is not None:
+            query = query.where(self.model.updated_at >= updated_after)
+        if updated_before is not None:
+            query = query.where(self.model.updated_at < updated_before)
+        result = await db.execute(query)
+        return result.scalars().all()
+
     async def create(
         self,
         db: AsyncSession,
@@ -83,7 +230,66 @@ class BaseModelController():
         db.add(db_obj)
         await db.commit()
         await db.refresh(db_obj)
+        await self._refresh_cache(db_obj)
+
+        return db_obj
+
+    async def update_by_user_id(
+        self,
+        db: AsyncSession,
+        id: Any,
+        *,
+        obj_in: Union[UpdateSchemaType, Dict[str, Any]],
+        check_version: bool = False,
+        expected_updated_at: Optional[datetime.datetime] = None,
+    ) -> Optional[ModelType]:
+        """
+        Update the row with the given user ID in a single
+        `UPDATE ... RETURNING` statement, setting only the given fields.
 
+        Args:
+            id: User ID of the row.
+            obj_in: Fields to change; unset schema fields are left alone.
+            check_version: Only update the row if its updated_at is still
+                `expected_updated_at`, for optimistic concurrency.
+            expected_updated_at: updated_at the row was read with; may be
+                None for rows that were never updated.
+
+        Returns:
+            Optional[ModelType]: The updated row, or None if no row matched.
+        """
+        if isinstance(obj_in, dict):
+            update_data = dict(obj_in)
+        else:
+            update_data = obj_in.dict(exclude_unset=True)
+
+        # Convert all datetime objects to UTC, stored without tzinfo
+        for key, value in update_data.items():
+            if isinstance(value, datetime.datetime) and value.tzinfo is not None:
+                update_data[key] = value.astimezone(
+                    datetime.timezone.utc
+                ).replace(tzinfo=None)
+
+        if not update_data:
+            return await self.get_by_user_id(db, id)
+
+        query = (
+            update(self.model)
+            .where(self.model.user_id == id)
+            .values(**update_data)
+            .returning(self.model)
+            .execution_options(synchronize_session=False)
+        )
+        if check_version:
+            # updated_at is nullable; NULL = NULL would never match
+            query = query.where(
+                self.model.updated_at.is_not_distinct_from(expected_updated_at)
+            )
+        result = await db.execute(query)
+        db_obj = result.scalars().first()
+        await db.commit()
+        if db_obj is not None:
+            await self._refresh_cache(db_obj)
         return db_obj
 
     async def patch(
@@ -106,6 +312,7 @@ class BaseModelController():
         db.add(db_obj)
         await db.commit()
         await db.refresh(db_obj)
+        await self._refresh_cache(db_obj)
 
         return db_obj
 
@@ -121,4 +328,5 @@ class BaseModelController():
         if db_obj is not None:
             await db.delete(db_obj)
             await db.commit()
+            await self._invalidate_cache(db_obj)
         return db_obj
@@ -0,0 +1,283 @@
+import abc
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+
+class TTLCache:
+    """
+    Bounded in-process cache with per-entry expiry and LRU eviction.
+    """
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SharedCacheBackend(abc.ABC):
+    """
+    Cache shared between replicas. Values are JSON documents.
+    """
+
+    @abc.abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        ...
+
+    @abc.abstractmethod
+    async def set(self, key: str, value: str, ttl: float):
+        ...
+
+    @abc.abstractmethod
+    async def delete(self, key: str):
+        ...
+
+    async def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        return [await self.get(key) for key in keys]
+
+    async def set_many(self, values: Dict[str, str], ttl: float):
+        for key, value in values.items():
+            await self.set(key, value, ttl)
+
+    async def close(self):
+        pass
+
+
+class RedisCacheBackend(SharedCacheBackend):
+    def __init__(self, url: str, prefix: str) -> None:
+        # redis is installed together with arq
+        from redis.asyncio import Redis
+
+        self.redis = Redis.from_url(url)
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self.redis.get(self.prefix + key)
+        return value.decode() if value is not None else None
+
+    async def set(self, key: str, value: str, ttl: float):
+        await self.redis.set(self.prefix + key, value, px=int(ttl * 1000))
+
+    async def delete(self, key: str):
+        await self.redis.delete(self.prefix + key)
+
+    async def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        values = await self.redis.mget([self.prefix + key for key in keys])
+        return [value.decode() if value is not None else None for value in values]
+
+    async def set_many(self, values: Dict[str, str], ttl: float):
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key, value in values.items():
+                pipe.set(self.prefix + key, value, px=int(ttl * 1000))
+            await pipe.execute()
+
+    async def close(self):
+        await self.redis.close()
+
+
+class ReadThroughCache:
+    """
+    Read-through cache of JSON-compatible documents.
+
+    Lookups go to the in-process cache, then to the optional shared backend,
+    then to the loader. Concurrent misses for the same key share a single
+    load. Errors of the shared backend are logged and treated as misses so
+    that the database stays the source of truth.
+    """
+
+    def __init__(
+            self,
+            local: TTLCache,
+            shared: Optional[SharedCacheBackend] = None,
+            shared_ttl: Optional[float] = None,
+    ) -> None:
+        self.local = local
+        self.shared = shared
+        self.shared_ttl = shared_ttl if shared_ttl is not None else local.ttl
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Bumped by every write; results of loads that overlapped a write
+        # may be stale and are not cached
+        self.generation = 0
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.loads = 0
+
+    async def get_or_load(
+            self, key: str, loader: Callable[[], Awaitable[Optional[dict]]]
+    ) -> Optional[dict]:
+        """
+        Return the cached document for `key`, loading it on a miss.
+        `None` results are not cached.
+        """
+        value = self.local.get(key)
+        if value is not MISSING:
+            self.hits += 1
+            return value
+
+        value = await self._shared_get(key)
+        if value is not None:
+            self.shared_hits += 1
+            self.local.set(key, value)
+            return value
+
+        self.misses += 1
+        load = self._inflight.get(key)
+        if load is None:
+            load = asyncio.ensure_future(self._load(key, loader, self.generation))
+            self._inflight[key] = load
+        return await asyncio.shield(load)
+
+    async def get_many(self, keys: List[str]) -> Dict[str, dict]:
+        """
+        Return the cached documents among `keys`. Keys that are not cached
+        are left out, to be loaded by the caller in one query and stored
+        with `set_many`.
+        """
+        found = {}
+        for key in keys:
+            value = self.local.get(key)
+            if value is not MISSING:
+                found[key] = value
+        self.hits += len(found)
+        remaining = [key for key in keys if key not in found]
+        if remaining and self.shared is not None:
+            try:
+                values = await self.shared.get_many(remaining)
+            except Exception as e:
+                logger.warning(f"Shared cache get failed for {len(remaining)} keys: {e}")
+                values = [None] * len(remaining)
+            for key, value in zip(remaining, values):
+                if value is not None:
+                    value = json.loads(value)
+                    self.local.set(key, value)
+                    found[key] = value
+                    self.shared_hits += 1
+        self.misses += len(keys) - len(found)
+        return found
+
+    async def set_many(self, values: Dict[str, dict], generation: int):
+        """
+        Store documents loaded in bulk, unless a write happened since
+        `generation` was read, before the load started.
+        """
+        self.loads += 1
+        if generation == self.generation:
+            await self._store(values)
+
+    async def _load(self, key: str, loader, generation: int) -> Optional[dict]:
+        self.loads += 1
+        try:
+            value = await loader()
+        finally:
+            self._inflight.pop(key, None)
+        if value is not None and generation == self.generation:
+            await self._store({key: value})
+        return value
+
+    async def set(self, key: str, value: dict):
+        """
+        Store a fresh document right after a write.
+        """
+        self.generation += 1
+        await self._store({key: value})
+
+    async def invalidate(self, key: str):
+        self.generation += 1
+        self.local.delete(key)
+        if self.shared is not None:
+            try:
+                await self.shared.delete(key)
+            except Exception as e:
+                logger.warning(f"Shared cache delete failed for {key}: {e}")
+
+    async def _store(self, values: Dict[str, dict]):
+        if not values:
+            return
+        values = {key: jsonable_encoder(value) for key, value in values.items()}
+        for key, value in values.items():
+            self.local.set(key, value)
+        if self.shared is not None:
+            try:
+                await self.shared.set_many(
+                    {key: json.dumps(value) for key, value in values.items()},
+                    self.shared_ttl,
+                )
+            except Exception as e:
+                logger.warning(f"Shared cache set failed for {list(values)}: {e}")
+
+    async def _shared_get(self, key: str) -> Optional[dict]:
+        if self.shared is None:
+            return None
+        try:
+            value = await self.shared.get(key)
+        except Exception as e:
+            logger.warning(f"Shared cache get failed for {key}: {e}")
+            return None
+        return json.loads(value) if value is not None else None
+
+    async def close(self):
+        if self.shared is not None:
+            await self.shared.close()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.local),
+            "max_size": self.local.max_size,
+            "ttl_seconds": self.local.ttl,
+            "shared": self.shared is not None,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "loads": self.loads,
+        }
+
+
+def create_profile_cache() -> ReadThroughCache:
+    shared = None
+    if settings.PROFILE_CACHE_REDIS_URL:
+        shared = RedisCacheBackend(settings.PROFILE_CACHE_REDIS_URL, prefix="profile:")
+    return ReadThroughCache(
+        TTLCache(settings.PROFILE_CACHE_SIZE, settings.PROFILE_CACHE_TTL_SECONDS),
+        shared=shared,
+        shared_ttl=settings.PROFILE_CACHE_SHARED_TTL_SECONDS,
+    )
+
+
+profile_cache = create_profile_cache()
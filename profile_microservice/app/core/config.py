@@ -18,6 +18,16 @@ class Settings(BaseSettings):
     GET_TOKEN_DATA_403: str = 'Could not validate credentials'
     GET_CURRENT_USER_404: str = 'User not found'
     OAUTH2_NOT_AUTHENTICATED: str = 'Not authenticated'
+    # Read-through profile cache. Without a shared backend every replica
+    # may serve a profile up to PROFILE_CACHE_TTL_SECONDS after another
+    # replica changed it.
+    PROFILE_CACHE_SIZE: int = 10000
+    PROFILE_CACHE_TTL_SECONDS: float = 30
+    PROFILE_CACHE_REDIS_URL: Optional[str] = None
+    PROFILE_CACHE_SHARED_TTL_SECONDS: float = 300
+    PROFILES_BATCH_MAX_IDS: int = 500
+    PROFILES_PAGE_SIZE: int = 50
+    PROFILES_MAX_PAGE_SIZE: int = 500
 
     @validator("POSTGRES_URI", pre=True)
     def validate_postgres_conn(cls, v: Optional[str], values: dict[str, Any]) -> str:
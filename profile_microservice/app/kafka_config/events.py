@@ -0,0 +1,113 @@
+import datetime
+import json
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+# Kept in sync between the services that produce and consume events.
+
+SCHEMA_VERSION = 1
+# Version 0 is the legacy headerless JSON body {"type": ..., <payload>}
+SUPPORTED_VERSIONS = {0, 1}
+
+HEADER_CONTENT_TYPE = "content-type"
+HEADER_SCHEMA_VERSION = "schema-version"
+HEADER_EVENT_TYPE = "event-type"
+HEADER_EVENT_ID = "event-id"
+HEADER_PRODUCED_AT = "produced-at"
+
+Headers = List[Tuple[str, bytes]]
+
+
+class UnsupportedEventError(Exception):
+    pass
+
+
+class JsonCodec:
+    content_type = "application/json"
+
+    @staticmethod
+    def encode(payload: Dict[str, Any]) -> bytes:
+        return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+    @staticmethod
+    def decode(data: bytes) -> Dict[str, Any]:
+        return json.loads(data)
+
+
+class MsgpackCodec:
+    content_type = "application/msgpack"
+
+    @staticmethod
+    def encode(payload: Dict[str, Any]) -> bytes:
+        # imported lazily so that JSON-only deployments don't need msgpack
+        import msgpack
+
+        return msgpack.packb(payload, use_bin_type=True)
+
+    @staticmethod
+    def decode(data: bytes) -> Dict[str, Any]:
+        import msgpack
+
+        return msgpack.unpackb(data, raw=False)
+
+
+CODECS = {codec.content_type: codec for codec in (JsonCodec, MsgpackCodec)}
+CODEC_NAMES = {"json": JsonCodec, "msgpack": MsgpackCodec}
+
+
+class EventEnvelope(BaseModel):
+    event_type: str
+    payload: Dict[str, Any]
+    version: int = SCHEMA_VERSION
+    event_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    produced_at: Optional[datetime.datetime] = None
+
+    def encode(self, codec=JsonCodec) -> Tuple[bytes, Headers]:
+        """
+        Encode the payload with a codec and describe it in Kafka headers.
+
+        Returns:
+            Tuple[bytes, Headers]: The message value and headers.
+        """
+        produced_at = self.produced_at or datetime.datetime.now(datetime.timezone.utc)
+        headers = [
+            (HEADER_CONTENT_TYPE, codec.content_type.encode()),
+            (HEADER_SCHEMA_VERSION, str(self.version).encode()),
+            (HEADER_EVENT_TYPE, self.event_type.encode()),
+            (HEADER_EVENT_ID, self.event_id.encode()),
+            (HEADER_PRODUCED_AT, produced_at.isoformat().encode()),
+        ]
+        return codec.encode(self.payload), headers
+
+    @classmethod
+    def decode(cls, value: bytes, headers: Optional[Headers]) -> "EventEnvelope":
+        """
+        Decode a Kafka message of any supported schema version.
+
+        Raises:
+            UnsupportedEventError: If the version or content type is unknown.
+        """
+        metadata = {key: data.decode() for key, data in headers or ()}
+        if HEADER_CONTENT_TYPE not in metadata:
+            body = JsonCodec.decode(value)
+            event_type = body.pop("type")
+            return cls(event_type=event_type, payload=body, version=0)
+
+        version = int(metadata.get(HEADER_SCHEMA_VERSION, SCHEMA_VERSION))
+        if version not in SUPPORTED_VERSIONS:
+            raise UnsupportedEventError(f"Unsupported event schema version {version}")
+        codec = CODECS.get(metadata[HEADER_CONTENT_TYPE])
+        if codec is None:
+            raise UnsupportedEventError(
+                f"Unsupported event content type {metadata[HEADER_CONTENT_TYPE]}"
+            )
+        produced_at = metadata.get(HEADER_PRODUCED_AT)
+        return cls(
+            event_type=metadata[HEADER_EVENT_TYPE],
+            payload=codec.decode(value),
+            version=version,
+            event_id=metadata.get(HEADER_EVENT_ID) or str(uuid.uuid4()),
+            produced_at=datetime.datetime.fromisoformat(produced_at) if produced_at else None,
+        )
@@ -1,42 +1,184 @@
 import os
 import asyncio
-import json
+import datetime
+import random
+import time
 
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 import uuid
 
-from aiokafka import AIOKafkaConsumer
+from aiokafka import (
+    AIOKafkaConsumer, AIOKafkaProducer, ConsumerRebalanceListener, TopicPartition
+)
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.dialects.postgresql import insert
 
-from app.api.deps import get_session
+from app.core.database import SessionLocal
+from app.kafka_config.events import EventEnvelope
 from app.models import Profile
 
 import logging
 
 KAFKA_BOOTSTRAP_SERVERS = os.getenv('KAFKA_BOOTSTRAP_SERVERS', 'kafka:9092')
 TOPIC_NAME = os.getenv('KAFKA_TOPIC', 'user_events')
+KAFKA_GROUP_ID = os.getenv('KAFKA_GROUP_ID', 'profile_service')
+KAFKA_BATCH_MAX_RECORDS = int(os.getenv('KAFKA_BATCH_MAX_RECORDS', '1000'))
+KAFKA_BATCH_TIMEOUT_MS = int(os.getenv('KAFKA_BATCH_TIMEOUT_MS', '500'))
+# Partition batches stored concurrently, across all assigned partitions
+KAFKA_MAX_IN_FLIGHT = int(os.getenv('KAFKA_MAX_IN_FLIGHT', '4'))
+# Fetched batches buffered per partition before the partition is paused
+KAFKA_PARTITION_QUEUE_SIZE = int(os.getenv('KAFKA_PARTITION_QUEUE_SIZE', '2'))
+KAFKA_DLQ_TOPIC = os.getenv('KAFKA_DLQ_TOPIC', f'{TOPIC_NAME}.dlq')
+KAFKA_MAX_RETRIES = int(os.getenv('KAFKA_MAX_RETRIES', '5'))
+KAFKA_RETRY_BACKOFF_MS = int(os.getenv('KAFKA_RETRY_BACKOFF_MS', '200'))
+KAFKA_RETRY_BACKOFF_MAX_MS = int(os.getenv('KAFKA_RETRY_BACKOFF_MAX_MS', '30000'))
+
+DLQ_HEADER_PREFIX = "dlq-"
+
+FailedRecord = Tuple[object, Exception, int]
+
+# Errors caused by the content of a record; anything else, e.g. a lost
+# database connection, is treated as an outage and never dead-lettered
+RECORD_ERRORS = (
+    ValueError, TypeError, KeyError, sa_exc.DataError, sa_exc.IntegrityError
+)
 
 logger = logging.getLogger(__name__)
 
 
+class PartitionStats:
+    def __init__(self) -> None:
+        self.processed = 0
+        self.batches = 0
+        self.committed: Optional[int] = None
+        self.retries = 0
+        self.dead_lettered = 0
+        self.last_batch_ms = 0.0
+        self.total_batch_ms = 0.0
+
+    def record(self, records: int, next_offset: int, elapsed_ms: float):
+        self.processed += records
+        self.batches += 1
+        self.committed = next_offset
+        self.last_batch_ms = elapsed_ms
+        self.total_batch_ms += elapsed_ms
+
+
+class PartitionWorker:
+    """
+    Stores the batches of one partition in order, so events with the same
+    key are applied in the order they were produced.
+    """
+
+    def __init__(self, owner: "KafkaConsumer", tp: TopicPartition) -> None:
+        self.owner = owner
+        self.tp = tp
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            records = await self.queue.get()
+            try:
+                await self.owner.process_batch(self.tp, records)
+            except Exception as e:
+                logger.exception(f"Worker for partition {self.tp.partition} failed")
+                self.owner.fail(e)
+                return
+            finally:
+                self.queue.task_done()
+                self.owner.maybe_resume(self)
+
+    async def stop(self, drain: bool):
+        if drain and not self.task.done():
+            # A worker that fails leaves the rest of its queue unprocessed,
+            # so stop waiting for the queue as soon as the worker exits
+            join = asyncio.ensure_future(self.queue.join())
+            await asyncio.wait({join, self.task}, return_when=asyncio.FIRST_COMPLETED)
+            join.cancel()
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+
+
+class RebalanceListener(ConsumerRebalanceListener):
+    def __init__(self, owner: "KafkaConsumer") -> None:
+        self.owner = owner
+
+    async def on_partitions_revoked(self, revoked):
+        # Finish and commit what was fetched before handing partitions over
+        await self.owner.stop_workers(revoked, drain=True)
+        for tp in revoked:
+            self.owner.partition_stats.pop(tp, None)
+
+    async def on_partitions_assigned(self, assigned):
+        logger.info(f"Assigned partitions: {sorted(tp.partition for tp in assigned)}")
+
+
 class KafkaConsumer:
     """
     Asynchronous Kafka Consumer.
 
     Initializes a Kafka Consumer with the specified bootstrap servers.
+    The consumer joins a consumer group, so partitions are spread across
+    profile replicas. Each assigned partition is processed by its own
+    worker, in batches, and its offsets are committed manually once a batch
+    has been stored.
+
+    Failed batches are retried with exponential backoff on their own
+    partition only. Records that still fail, or cannot be decoded, are
+    published to a dead-letter topic with the error in their headers.
     """
 
-    def __init__(self) -> None:
+    def __init__(
+            self,
+            batch_max_records: int = KAFKA_BATCH_MAX_RECORDS,
+            batch_timeout_ms: int = KAFKA_BATCH_TIMEOUT_MS,
+            max_in_flight: int = KAFKA_MAX_IN_FLIGHT,
+            partition_queue_size: int = KAFKA_PARTITION_QUEUE_SIZE,
+            max_retries: int = KAFKA_MAX_RETRIES,
+            retry_backoff_ms: int = KAFKA_RETRY_BACKOFF_MS,
+            retry_backoff_max_ms: int = KAFKA_RETRY_BACKOFF_MAX_MS,
+    ) -> None:
         """
         Initialize Kafka consumer.
 
         Args:
-            bootstrap_servers (Optional[str]): Kafka bootstrap servers.
-                Defaults to environment variable KAFKA_BOOTSTRAP_SERVERS or
-                'kafka:9092'.
+            batch_max_records (int): Maximum number of records per batch.
+                Defaults to KAFKA_BATCH_MAX_RECORDS.
+            batch_timeout_ms (int): How long to wait for records to fill a
+                batch. Defaults to KAFKA_BATCH_TIMEOUT_MS.
+            max_in_flight (int): Partition batches stored concurrently.
+                Defaults to KAFKA_MAX_IN_FLIGHT.
+            partition_queue_size (int): Batches buffered per partition
+                before fetching from it is paused. Defaults to
+                KAFKA_PARTITION_QUEUE_SIZE.
+            max_retries (int): Retries of a failing batch before its
+                records are dead-lettered. Defaults to KAFKA_MAX_RETRIES.
+            retry_backoff_ms (int): First retry delay, doubled on every
+                attempt. Defaults to KAFKA_RETRY_BACKOFF_MS.
+            retry_backoff_max_ms (int): Upper bound of retry and restart
+                delays. Defaults to KAFKA_RETRY_BACKOFF_MAX_MS.
         """
         self.bootstrap_servers = KAFKA_BOOTSTRAP_SERVERS
+        self.batch_max_records = batch_max_records
+        self.batch_timeout_ms = batch_timeout_ms
+        self.max_in_flight = max_in_flight
+        self.partition_queue_size = partition_queue_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff_ms / 1000
+        self.retry_backoff_max = retry_backoff_max_ms / 1000
         self.consumer: Optional[AIOKafkaConsumer] = None
-        
+        self.producer: Optional[AIOKafkaProducer] = None
+        self._failure: Optional[Exception] = None
+        self._supervisor: Optional[asyncio.Task] = None
+        self.restarts = 0
+        self.in_flight = asyncio.Semaphore(max_in_flight)
+        self.workers: Dict[TopicPartition, PartitionWorker] = {}
+        self.partition_stats: Dict[TopicPartition, PartitionStats] = {}
+
     async def __aenter__(self):
         """
         Async context manager entry.
@@ -62,12 +204,17 @@ class KafkaConsumer:
         Start the Kafka producer.
         """
         if self.consumer is None:
-            loop = asyncio.get_running_loop()
             self.consumer = AIOKafkaConsumer(
-                TOPIC_NAME,
                 bootstrap_servers=self.bootstrap_servers,
-                loop=loop
+                group_id=KAFKA_GROUP_ID,
+                enable_auto_commit=False,
+                auto_offset_reset="earliest",
+                max_poll_records=self.batch_max_records,
             )
+            self.consumer.subscribe([TOPIC_NAME], listener=RebalanceListener(self))
+            self.producer = AIOKafkaProducer(bootstrap_servers=self.bootstrap_servers)
+            self._failure = None
+            await self.producer.start()
             await self.consumer.start()
             logger.info("Kafka cosumer started.")
 
@@ -76,34 +223,232 @@ class KafkaConsumer:
         Stop the Kafka producer.
         """
         if self.consumer:
+            await self.stop_workers(list(self.workers), drain=False)
             await self.consumer.stop()
             self.consumer = None
             logger.info("Kafka consumer stopped.")
+        if self.producer:
+            await self.producer.stop()
+            self.producer = None
             
     async def consume(self):
         logger.info("Starting to consume messages...")
-        async for msg in self.consumer:
-            event = json.loads(msg.value.decode("utf-8"))
-            event_type = event["type"]
-            user_data = event["user"]
-            logger.info(f"Consumed event: {event_type} for user: {user_data}")
+        while True:
+            if self._failure is not None:
+                raise self._failure
+            batches = await self.consumer.getmany(
+                timeout_ms=self.batch_timeout_ms, max_records=self.batch_max_records
+            )
+            for tp, records in batches.items():
+                worker = self.workers.get(tp)
+                if worker is None:
+                    worker = self.workers[tp] = PartitionWorker(self, tp)
+                worker.queue.put_nowait(records)
+                if worker.queue.qsize() >= self.partition_queue_size:
+                    self.consumer.pause(tp)
+
+    async def process_batch(self, tp: TopicPartition, records: list):
+        """
+        Store the events of one partition batch and commit its offset.
 
-            if event_type == "user_created":
-                await self.handle_user_created(user_data)
+        Records that cannot be decoded or stored are dead-lettered so that
+        the partition keeps moving.
+        """
+        started = time.perf_counter()
+        stats = self.partition_stats.setdefault(tp, PartitionStats())
+        pending = []
+        failed: List[FailedRecord] = []
+        for msg in records:
+            try:
+                event = EventEnvelope.decode(msg.value, msg.headers)
+                if event.event_type == "user_created":
+                    user = event.payload["user"]
+                    uuid.UUID(str(user["id"]))
+                    pending.append((msg, user))
+            except Exception as e:
+                failed.append((msg, e, 0))
+        if pending:
+            failed.extend(await self._store_with_retry(stats, pending))
+        for msg, error, attempts in failed:
+            await self.dead_letter(msg, error, attempts)
+        stats.dead_lettered += len(failed)
+        next_offset = records[-1].offset + 1
+        await self.consumer.commit({tp: next_offset})
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        stats.record(len(records), next_offset, elapsed_ms)
+
+    async def _store_with_retry(self, stats: PartitionStats, pending: list) -> List[FailedRecord]:
+        """
+        Store a batch, retrying with backoff. Returns the records that
+        failed because of their content.
+
+        Raises:
+            Exception: If the batch cannot be stored for another reason;
+                the consumer then restarts and the batch is redelivered.
+        """
+        attempts = 0
+        while True:
+            try:
+                async with self.in_flight:
+                    await self.handle_users_created([user for _, user in pending])
+                return []
+            except Exception as e:
+                error = e
+            attempts += 1
+            if isinstance(error, RECORD_ERRORS) or attempts > self.max_retries:
+                break
+            stats.retries += 1
+            delay = min(self.retry_backoff * 2 ** (attempts - 1), self.retry_backoff_max)
+            logger.warning(f"Storing batch failed (attempt {attempts}), retrying in {delay:.2f}s: {error}")
+            await asyncio.sleep(delay * random.uniform(0.5, 1))
+
+        if not isinstance(error, RECORD_ERRORS):
+            raise error
+        if len(pending) == 1:
+            return [(pending[0][0], error, attempts)]
+        # Find the records that poison the batch
+        failed = []
+        for msg, user in pending:
+            try:
+                async with self.in_flight:
+                    await self.handle_users_created([user])
+            except RECORD_ERRORS as e:
+                failed.append((msg, e, attempts + 1))
+        return failed
+
+    async def dead_letter(self, msg, error: Exception, attempts: int):
+        """
+        Publish a record to the dead-letter topic with error metadata.
+        """
+        headers = list(msg.headers or ()) + [
+            (f"{DLQ_HEADER_PREFIX}original-topic", msg.topic.encode()),
+            (f"{DLQ_HEADER_PREFIX}original-partition", str(msg.partition).encode()),
+            (f"{DLQ_HEADER_PREFIX}original-offset", str(msg.offset).encode()),
+            (f"{DLQ_HEADER_PREFIX}error-type", type(error).__name__.encode()),
+            (f"{DLQ_HEADER_PREFIX}error", str(error)[:1000].encode()),
+            (f"{DLQ_HEADER_PREFIX}attempts", str(attempts).encode()),
+            (f"{DLQ_HEADER_PREFIX}failed-at",
+             datetime.datetime.now(datetime.timezone.utc).isoformat().encode()),
+        ]
+        await self.producer.send_and_wait(
+            KAFKA_DLQ_TOPIC, msg.value, key=msg.key, headers=headers
+        )
+        logger.error(
+            f"Dead-lettered record {msg.topic}-{msg.partition}@{msg.offset}: {error}"
+        )
+
+    def fail(self, error: Exception):
+        """
+        Report a worker failure; the consume loop raises it so that the
+        supervisor restarts the consumer.
+        """
+        if self._failure is None:
+            self._failure = error
+
+    def start_supervisor(self):
+        if self._supervisor is None:
+            self._supervisor = asyncio.create_task(self.supervise())
+
+    async def stop_supervisor(self):
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+            try:
+                await self._supervisor
+            except asyncio.CancelledError:
+                pass
+            self._supervisor = None
+        await self.stop()
+
+    async def supervise(self):
+        """
+        Run the consume loop, restarting the consumer with exponential
+        backoff whenever it fails.
+        """
+        delay = self.retry_backoff
+        while True:
+            started = time.monotonic()
+            try:
+                await self.start()
+                await self.consume()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Kafka consumer failed, restarting")
+            try:
+                await self.stop()
+            except Exception:
+                logger.exception("Error stopping Kafka consumer")
+            self.restarts += 1
+            if time.monotonic() - started > self.retry_backoff_max:
+                delay = self.retry_backoff
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.retry_backoff_max)
+
+    def maybe_resume(self, worker: PartitionWorker):
+        if (self.consumer is not None
+                and worker.queue.qsize() < self.partition_queue_size
+                and worker.tp in self.consumer.paused()):
+            self.consumer.resume(worker.tp)
+
+    async def stop_workers(self, partitions, drain: bool):
+        workers = [self.workers.pop(tp) for tp in partitions if tp in self.workers]
+        await asyncio.gather(*(worker.stop(drain) for worker in workers))
+
+    def stats(self) -> dict:
+        """
+        Per-partition lag and processing time of this replica.
+
+        Lag is the distance between the partition high watermark and the
+        last committed offset, as of the latest fetch.
+        """
+        # highwater() only works for partitions assigned right now
+        assigned = self.consumer.assignment() if self.consumer else set()
+        partitions = {}
+        for tp, stats in list(self.partition_stats.items()):
+            highwater = self.consumer.highwater(tp) if tp in assigned else None
+            lag = None
+            if highwater is not None and stats.committed is not None:
+                lag = max(highwater - stats.committed, 0)
+            worker = self.workers.get(tp)
+            partitions[f"{tp.topic}-{tp.partition}"] = {
+                "assigned": tp in assigned,
+                "lag": lag,
+                "queued_batches": worker.queue.qsize() if worker else 0,
+                "processed": stats.processed,
+                "retries": stats.retries,
+                "dead_lettered": stats.dead_lettered,
+                "batches": stats.batches,
+                "last_batch_ms": round(stats.last_batch_ms, 2),
+                "avg_batch_ms": (
+                    round(stats.total_batch_ms / stats.batches, 2) if stats.batches else None
+                ),
+            }
+        return {
+            "max_in_flight": self.max_in_flight,
+            "restarts": self.restarts,
+            "partitions": partitions,
+        }
 
     @staticmethod
-    async def handle_user_created(user_data: dict):
-        async for session in get_session():
+    async def handle_users_created(users_data: List[dict]):
+        """
+        Create the profiles of a batch of new users in one transaction.
+
+        Users that already have a profile are skipped, so redelivered and
+        replayed events are harmless.
+        """
+        user_ids = dict.fromkeys(str(user_data.get("id")) for user_data in users_data)
+        rows = [{"id": uuid.uuid4(), "user_id": user_id} for user_id in user_ids]
+        async with SessionLocal() as session:
             async with session.begin():
-                user_id = user_data.get("id")
-                profile = Profile(
-                    user_id=str(user_id),
-                    id=uuid.uuid4()
+                await session.execute(
+                    insert(Profile).on_conflict_do_nothing(index_elements=[Profile.user_id]),
+                    rows,
                 )
-                session.add(profile)
-                await session.commit()
-                await session.refresh(profile)
-                logger.info(f"Profile created for user: {user_id}")
+        logger.info(f"Profiles ensured for {len(rows)} users")
 
+    @classmethod
+    async def handle_user_created(cls, user_data: dict):
+        await cls.handle_users_created([user_data])
 
 kafka_consumer = KafkaConsumer()
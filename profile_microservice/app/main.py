@@ -1,7 +1,7 @@
-import asyncio
 import logging
 
 from app.api import router
+from app.core.cache import profile_cache
 from app.core.config import settings
 from app.kafka_config.kafka_consumer import kafka_consumer
 from fastapi import FastAPI
@@ -18,6 +18,7 @@ def create_application() -> FastAPI:
         allow_credentials=True,
         allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
         allow_headers=["*"],
+        expose_headers=["ETag", "X-Next-Cursor"],
     )
     application.include_router(router)
     return application
@@ -29,19 +30,18 @@ app = create_application()
 @app.on_event("startup")
 async def startup():
     logger.info("Starting Kafka consumer...")
-    try:
-        await kafka_consumer.start()
-        asyncio.create_task(kafka_consumer.consume())
-        logger.info("Kafka consumer started.")
-    except Exception as e:
-        logger.error(f"Error starting Kafka consumer: {e}")
+    kafka_consumer.start_supervisor()
 
 
 @app.on_event("shutdown")
 async def shutdown():
     logger.info("Stopping Kafka consumer...")
     try:
-        await kafka_consumer.stop()
+        await kafka_consumer.stop_supervisor()
         logger.info("Kafka consumer stopped.")
     except Exception as e:
         logger.error(f"Error stopping Kafka consumer: {e}")
+    try:
+        await profile_cache.close()
+    except Exception as e:
+        logger.error(f"Error closing profile cache: {e}")
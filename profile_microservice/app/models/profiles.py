@@ -1,16 +1,28 @@
 import datetime
 import uuid
 
-from sqlalchemy import UUID, Column, String, DateTime, Text
+from sqlalchemy import UUID, Column, String, DateTime, Index, Text
 from app.models.base import Base
 
 
 class Profile(Base):
+    __table_args__ = (
+        # Covers the id/updated_at lookups of conditional requests, which
+        # can then be answered by an index-only scan
+        Index(
+            'ix_profile_user_id', 'user_id', unique=True,
+            postgresql_include=['id', 'updated_at'],
+        ),
+        # Keyset pagination and incremental sync
+        Index('ix_profile_created_at_id', 'created_at', 'id'),
+        Index('ix_profile_updated_at', 'updated_at'),
+    )
+
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4(), nullable=False)
-    user_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    user_id = Column(UUID(as_uuid=True), nullable=False)
     name = Column(Text, nullable=True)
     lastname = Column(Text, nullable=True)
     birthday = Column(DateTime, nullable=True)
     profile_picture_url = Column(String, nullable=True)
-    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
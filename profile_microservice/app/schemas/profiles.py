@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 from uuid import UUID
 from pydantic import BaseModel
 from datetime import datetime
@@ -23,3 +23,12 @@ class ProfileResponse(ProfileBase):
 
 class ProfileUpdate(ProfileBase):
     ...
+
+
+class ProfileBatchRequest(BaseModel):
+    user_ids: List[UUID]
+
+
+class ProfileBatchResponse(BaseModel):
+    profiles: List[Optional[ProfileResponse]]
+    missing: List[UUID]
@@ -0,0 +1,119 @@
+import asyncio
+from typing import Dict, List, Optional
+
+import pytest
+
+from app.core.cache import MISSING, ReadThroughCache, SharedCacheBackend, TTLCache
+
+
+class Loader:
+    """
+    Loader that counts its calls and, if given an event, blocks until it
+    is set.
+    """
+
+    def __init__(self, value: Optional[dict], release: Optional[asyncio.Event] = None) -> None:
+        self.value = value
+        self.release = release
+        self.calls = 0
+
+    async def __call__(self) -> Optional[dict]:
+        self.calls += 1
+        if self.release is not None:
+            await self.release.wait()
+        return self.value
+
+
+class BrokenBackend(SharedCacheBackend):
+    async def get(self, key: str) -> Optional[str]:
+        raise ConnectionError("redis unreachable")
+
+    async def set(self, key: str, value: str, ttl: float):
+        raise ConnectionError("redis unreachable")
+
+    async def delete(self, key: str):
+        raise ConnectionError("redis unreachable")
+
+    async def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        raise ConnectionError("redis unreachable")
+
+    async def set_many(self, values: Dict[str, str], ttl: float):
+        raise ConnectionError("redis unreachable")
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_ttl_cache_drops_expired_entries():
+    cache = TTLCache(max_size=2, ttl=0)
+    cache.set("a", 1)
+
+    assert cache.get("a") is MISSING
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_load():
+    cache = ReadThroughCache(TTLCache(max_size=10, ttl=60))
+    release = asyncio.Event()
+    loader = Loader({"name": "user"}, release)
+
+    pending = asyncio.gather(
+        cache.get_or_load("1", loader), cache.get_or_load("1", loader)
+    )
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await pending == [{"name": "user"}, {"name": "user"}]
+    assert loader.calls == 1
+    assert cache.stats()["loads"] == 1
+
+
+@pytest.mark.asyncio
+async def test_write_during_load_keeps_loaded_value_out():
+    cache = ReadThroughCache(TTLCache(max_size=10, ttl=60))
+    release = asyncio.Event()
+    loader = Loader({"name": "old"}, release)
+
+    pending = asyncio.ensure_future(cache.get_or_load("1", loader))
+    await asyncio.sleep(0)
+    await cache.set("1", {"name": "new"})
+    release.set()
+
+    assert await pending == {"name": "old"}
+    assert cache.local.get("1") == {"name": "new"}
+
+
+@pytest.mark.asyncio
+async def test_expired_entry_is_reloaded():
+    cache = ReadThroughCache(TTLCache(max_size=10, ttl=0))
+    loader = Loader({"name": "user"})
+
+    await cache.get_or_load("1", loader)
+    await cache.get_or_load("1", loader)
+
+    assert loader.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_shared_backend_errors_count_as_misses():
+    cache = ReadThroughCache(TTLCache(max_size=10, ttl=60), shared=BrokenBackend())
+    loader = Loader({"name": "user"})
+
+    assert await cache.get_or_load("1", loader) == {"name": "user"}
+    assert await cache.get_many(["2"]) == {}
+    assert await cache.get_or_load("1", loader) == {"name": "user"}
+
+    assert loader.calls == 1
+    assert cache.stats()["misses"] == 2
+    assert cache.stats()["hits"] == 1
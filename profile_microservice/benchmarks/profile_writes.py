@@ -0,0 +1,84 @@
+"""Profile writes per second, ORM path vs UPDATE ... RETURNING
+
+Updates the same set of throwaway profiles through the two write paths of
+BaseModelController and reports writes per second for each:
+
+- orm: SELECT the row, `update()` it through the ORM, COMMIT and
+  refresh it with another SELECT, as the API did before.
+- returning: a single `UPDATE ... WHERE user_id = :id RETURNING *` with
+  only the changed columns, then COMMIT.
+
+Runs against the database configured in the environment, like the API.
+The benchmark profiles are deleted at the end.
+
+Usage:
+    python -m benchmarks.profile_writes [--profiles 200] [--writes 2000] [--concurrency 10]
+
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from sqlalchemy import delete, insert
+
+from app.controllers.profiles import ProfileModelController
+from app.core.database import SessionLocal, engine
+from app.models.profiles import Profile as ProfileModel
+
+# No cache, so that only the database round trips are measured
+controller = ProfileModelController(ProfileModel)
+
+
+async def write_orm(user_id: uuid.UUID, name: str):
+    async with SessionLocal() as session:
+        profile = await controller.get_by_user_id(session, user_id)
+        await controller.update(session, db_obj=profile, obj_in={"name": name})
+
+
+async def write_returning(user_id: uuid.UUID, name: str):
+    async with SessionLocal() as session:
+        await controller.update_by_user_id(session, user_id, obj_in={"name": name})
+
+
+async def run(write, user_ids: list, writes: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            await write(user_ids[i % len(user_ids)], f"bench-{i}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(writes)))
+    return writes / (time.perf_counter() - started)
+
+
+async def main(args):
+    user_ids = [uuid.uuid4() for _ in range(args.profiles)]
+    async with SessionLocal() as session:
+        await session.execute(
+            insert(ProfileModel),
+            [{"id": uuid.uuid4(), "user_id": user_id} for user_id in user_ids],
+        )
+        await session.commit()
+    try:
+        for name, write in (("orm", write_orm), ("returning", write_returning)):
+            # Warm up the connection pool and statement caches
+            await run(write, user_ids, args.concurrency, args.concurrency)
+            rate = await run(write, user_ids, args.writes, args.concurrency)
+            print(f"{name:>9}: {rate:8.0f} writes/s")
+    finally:
+        async with SessionLocal() as session:
+            await session.execute(
+                delete(ProfileModel).where(ProfileModel.user_id.in_(user_ids))
+            )
+            await session.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", type=int, default=200)
+    parser.add_argument("--writes", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
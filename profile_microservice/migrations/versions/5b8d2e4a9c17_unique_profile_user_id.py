@@ -0,0 +1,38 @@
+"""Unique profile user_id
+
+Revision ID: 5b8d2e4a9c17
+Revises: 1f149e3fd6c1
+Create Date: 2026-10-18 11:40:52.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b8d2e4a9c17'
+down_revision = '1f149e3fd6c1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keep the most recently updated profile of every user
+    op.execute('''
+        DELETE FROM profile p
+        USING (
+            SELECT id, row_number() OVER (
+                PARTITION BY user_id
+                ORDER BY updated_at DESC NULLS LAST, created_at ASC NULLS LAST, id
+            ) AS rn
+            FROM profile
+        ) duplicates
+        WHERE p.id = duplicates.id AND duplicates.rn > 1
+    ''')
+    op.drop_index(op.f('ix_profile_user_id'), table_name='profile')
+    op.create_index(op.f('ix_profile_user_id'), 'profile', ['user_id'], unique=True)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_profile_user_id'), table_name='profile')
+    op.create_index(op.f('ix_profile_user_id'), 'profile', ['user_id'], unique=False)
@@ -0,0 +1,29 @@
+"""Profile user_id covering index
+
+Revision ID: 7d3a1c9e5f20
+Revises: 5b8d2e4a9c17
+Create Date: 2026-10-18 14:05:31.402817
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d3a1c9e5f20'
+down_revision = '5b8d2e4a9c17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.drop_index(op.f('ix_profile_user_id'), table_name='profile')
+    op.create_index(
+        op.f('ix_profile_user_id'), 'profile', ['user_id'], unique=True,
+        postgresql_include=['id', 'updated_at'],
+    )
+
+
+def downgrade():
+    op.drop_index(op.f('ix_profile_user_id'), table_name='profile')
+    op.create_index(op.f('ix_profile_user_id'), 'profile', ['user_id'], unique=True)
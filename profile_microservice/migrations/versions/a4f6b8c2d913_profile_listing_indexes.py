@@ -0,0 +1,33 @@
+"""Profile listing indexes
+
+Revision ID: a4f6b8c2d913
+Revises: 7d3a1c9e5f20
+Create Date: 2026-10-18 15:22:09.671340
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4f6b8c2d913'
+down_revision = '7d3a1c9e5f20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keyset pagination on (created_at, id) needs every row to have one
+    op.execute(
+        "UPDATE profile SET created_at = COALESCE(updated_at, now() AT TIME ZONE 'utc') "
+        "WHERE created_at IS NULL"
+    )
+    op.alter_column('profile', 'created_at', existing_type=sa.DateTime(), nullable=False)
+    op.create_index('ix_profile_created_at_id', 'profile', ['created_at', 'id'], unique=False)
+    op.create_index('ix_profile_updated_at', 'profile', ['updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_profile_updated_at', table_name='profile')
+    op.drop_index('ix_profile_created_at_id', table_name='profile')
+    op.alter_column('profile', 'created_at', existing_type=sa.DateTime(), nullable=True)